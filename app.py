@@ -1,360 +1,207 @@
 # -*- coding:utf-8 -*-
+import os
 import streamlit as st
 from streamlit_option_menu import option_menu
-import numpy as np
 import pandas as pd
-import folium
-from streamlit_folium import folium_static
+import streamlit.components.v1 as components
 import plotly.express as px
-import joblib
-from sklearn.preprocessing import StandardScaler
-from scipy.special import inv_boxcox
-import re
-
-# Streamlit 데이터 로드 함수
-def load_streamlit_data():
-    streamlit_df = pd.read_csv("./data/streamlit_df.csv")
-    streamlit_df['점포당_매출액'] = (streamlit_df['당월_매출_금액'] / streamlit_df['유사_업종_점포_수']).round()
-    streamlit_df['기준_년분기'] = streamlit_df['기준_년'].astype(str) + '년' + streamlit_df['기준_분기'].astype(str) + '분기'
-    streamlit_df['점포당_남성_매출_금액'] = streamlit_df['남성_매출_금액'] / streamlit_df['유사_업종_점포_수'].round()
-    streamlit_df['점포당_여성_매출_금액'] = streamlit_df['여성_매출_금액'] / streamlit_df['유사_업종_점포_수'].round()
-    # 요일 목록
-    weekdays = ['월요일', '화요일', '수요일', '목요일', '금요일', '토요일', '일요일']
-
-    # 요일별 매출액 계산
-    for day in weekdays:
-        col_name = f'점포당_{day}_매출액'
-        streamlit_df[col_name] = streamlit_df[f'{day}_매출_금액'] / streamlit_df['유사_업종_점포_수'].round()
-    return streamlit_df
-
-# 시간대별 데이터 로드 함수
-def load_quarter_data():
-    quarter_df = pd.read_csv("./data/final_merged_update_store_age_df.csv")
-    quarter_df['시간대별_점포당_매출액'] = (quarter_df['시간대_매출금액'] / quarter_df['유사_업종_점포_수']).round()
-    return quarter_df
+import data_loader
+import model_registry
+import maps
+import charts
+import areas
+import sensitivity
+import rankings
+from instrumentation import instrumentation, stage, rss_bytes
+
+# 페이지별로 사용하는 컬럼 (페이지를 열 때 해당 컬럼만 읽음)
+# 강남구 상권 분석: streamlit_df (지도/순위표, 상권별 분석의 지표 증감, 순위표와 같은 컬럼 목록을 써서 캐시를 공유)
+COMMERCIAL_COLUMNS = rankings.RANKING_COLUMNS
+
+# 상권별 분석: streamlit_df (지표/차트) + quarter_df (시간대별 차트, 가구 수)
+ANALYSIS_COLUMNS = ['기준_년', '기준_분기', '기준_년분기', '상권_코드_명', '행정동_코드_명',
+                    '점포당_매출액', '총_유동인구_수', '유사_업종_점포_수', '개업_점포_수', '폐업_점포_수',
+                    '점포당_남성_매출_금액', '점포당_여성_매출_금액',
+                    '남성_유동인구_수', '여성_유동인구_수', '남성_상주인구_수', '여성_상주인구_수'] \
+                   + [f'점포당_{day}_매출액' for day in data_loader.WEEKDAYS] \
+                   + [f'{day}_유동인구_수' for day in data_loader.WEEKDAYS] \
+                   + [f'연령대_{age}_{kind}' for kind in ['매출_금액', '유동인구_수', '상주인구_수']
+                      for age in ['10', '20', '30', '40', '50', '60_이상']]
+
+ANALYSIS_QUARTER_COLUMNS = ['기준_년', '기준_분기', '시간대', '상권_코드_명', '행정동_코드_명',
+                            '시간대_유동인구_수', '시간대별_점포당_매출액', '총_가구_수']
+
+# 매출 예측: quarter_df (입력 기본값, 슬라이더 범위)
+PREDICT_COLUMNS = ['기준_년', '기준_분기', '시간대', '상권_코드_명', '행정동_코드_명', '상권_구분_코드_명',
+                   '시간대_유동인구_수', '총_직장_인구_수',
+                   '연령대_10_직장인구_비율', '연령대_20_직장인구_비율', '연령대_30_직장인구_비율',
+                   '연령대_40_직장인구_비율', '연령대_50_직장인구_비율', '연령대_60_이상_직장_인구_비율',
+                   '총_상주인구_수', '연령대_10_상주인구_비율', '연령대_20_상주인구_비율', '연령대_30_상주인구_비율',
+                   '연령대_40_상주인구_비율', '연령대_50_상주인구_비율', '연령대_60_이상_상주인구_비율',
+                   '총_가구_수', '집객시설_수', '월_평균_소득_금액', '지출_총금액',
+                   '유사_업종_점포_수', '개업_점포_수', '폐업_점포_수', '영역_면적']
+
+# 여러 상권 비교에서 한 번에 선택할 수 있는 최대 상권 수
+MAX_COMPARE = 8
+
+# 디버그 패널 표시 여부 (APP_DEBUG=1로 실행하거나 주소에 ?debug=1을 붙이면 표시)
+DEBUG = os.environ.get('APP_DEBUG') == '1'
+
+# (기준_년, 기준_분기, 상권_코드_명) 인덱스 로드 함수
+# 파생 컬럼까지 계산된 DataFrame과 인덱스를 프로세스 전체에서 공유 (파일이 바뀔 때만 다시 읽음)
+@stage('load.streamlit_index')
+def load_streamlit_index(columns):
+    return data_loader.get_dataset_index('streamlit_df', columns)
+
+@stage('load.quarter_index')
+def load_quarter_index(columns):
+    return data_loader.get_dataset_index('quarter_df', columns)
+
+# 전체 (분기 x 지표) 순위표 로드 함수 (데이터가 다시 로드될 때만 다시 계산)
+@stage('load.rankings')
+def load_rankings():
+    return rankings.get_rankings(COMMERCIAL_COLUMNS)
+
+# 지도용 상권 경계 로드 함수 (미리 단순화해 둔 파일, 없으면 None)
+@stage('load.boundaries')
+def load_boundaries():
+    return areas.get_boundaries(maps.MAP_ZOOM)
 
 # 강남구 상권 분석 페이지 렌더링 함수
-def commercial_page(streamlit_df):
+# 순위표와 지도는 미리 계산해 둔 (분기, 지표)별 순위표에서 꺼내서 표시 (선택할 때마다 정렬하지 않음)
+@stage('commercial_page')
+def commercial_page(ranking_table):
     st.markdown("<h2 style='text-align: center;'>강남구 상권 분석</h2>", unsafe_allow_html=True)
 
-    # 필요한 데이터만 추출
-    streamlit_df = streamlit_df.loc[(streamlit_df['기준_년'] == 2023) & (streamlit_df['기준_분기'] == 3), :]
-
     col1, col2 = st.columns([5, 3])
 
-    with col2:
-        option_mapping = {
-            '유동인구': '총_유동인구_수',
-            '상주인구': '총_상주인구_수',
-            '매출': '점포당_매출액',
-            '점포수': '유사_업종_점포_수'
-        }
+    with col2, stage('commercial_page.leaderboard'):
+        # 기준 분기 선택 (기본: 가장 최근 분기)
+        quarter_options = {rankings.quarter_label(*key): key for key in ranking_table.quarters}
+        selected_quarter = st.selectbox('기준 분기', list(quarter_options), index=len(quarter_options) - 1)
+        year, quarter = quarter_options[selected_quarter]
 
         option = st.selectbox(
             '원하는 정보를 선택하세요',
-            options=['유동인구', '상주인구', '매출', '점포수'],
+            options=list(rankings.RANK_METRICS),
             help= "매출 = 해당 상권 매출 금액 / 점포수"
             )
 
-        if option in option_mapping:
-            column_name = option_mapping[option]
-            # 선택된 열의 데이터를 출력
-            st.write(streamlit_df[['상권_코드_명', '행정동_코드_명', column_name]]
-                        .sort_values(by=column_name, ascending=False)
-                        .reset_index(drop=True),
-                        use_container_width=True)
-
-    with col1: 
-        # 지도 생성
-        m = folium.Map(location=[37.5172, 127.0473], zoom_start=13)  # 서울 위도, 경도를 중심으로 지도 생성
-        
-        # 각 점에 대한 정보를 Folium으로 추가
-        for idx, row in streamlit_df.iterrows():
-
-            # 툴팁에 표시할 내용 설정
-            if option == '유동인구':
-                radius = row['총_유동인구_수']/100000
-                value = f"{int(row['총_유동인구_수'] / 10000)}만"
-            elif option == '상주인구':
-                radius = row['총_상주인구_수']/200
-                value = f"{int(row['총_상주인구_수']/1000)}천"
-            elif option == '매출':
-                radius = row['점포당_매출액']/10000000
-                value = f"{int(row['점포당_매출액']/1000000)}백만"
-            elif option == '점포수':
-                radius = row['유사_업종_점포_수']
-                value = f"{int(row['유사_업종_점포_수'])}"
-
-            # 툴팁에 표시할 내용 설정
-            tooltip = f"상권명: {row['상권_코드_명']}<br>" \
-                    f"매출금액: {row['당월_매출_금액']:,.0f}원<br>" \
-                    f"유동인구: {row['총_유동인구_수']:,.0f}명<br>" \
-                    f"총상주인구: {row['총_상주인구_수']:,.0f}명<br>"\
-                    f"점포수: {row['유사_업종_점포_수']:,.0f}개<br>"\
-                    
-            
+        board = ranking_table.board(year, quarter, option)
+        column_name = rankings.RANK_METRICS[option]
+        # 선택된 지표의 순위표 출력 (증감/순위 변화는 직전 분기 대비)
+        st.dataframe(board[['순위', '상권_코드_명', '행정동_코드_명', column_name, '증감', '순위_변화', '백분위']],
+                     hide_index=True, use_container_width=True,
+                     column_config={'백분위': st.column_config.NumberColumn(format='%.0f')})
 
-            folium.CircleMarker(                         # 원 표시
-                location=[row['위도'], row['경도']],      # 원 중심- 위도, 경도
-                radius=radius,          # 원의 반지름
-                color=None,                              # 원의 테두리 색상
-                fill_color='orange',                           # 원을 채움
-                fill_opacity=0.4,                     # 원의 내부를 채울 때의 투명도
-                tooltip=tooltip
-            ).add_to(m)                         # my_map에 원형 마커 추가
-
-            folium.Marker(                           # 값 표시
-                location=[row['위도'], row['경도']],   # 값 표시 위치- 위도, 경도
-                icon=folium.DivIcon(
-                    html=f"<div style='font-size: 8pt; font-weight: bold; white-space: nowrap;'>{value}</div>"), # 값 표시 방식
-            ).add_to(m)                         # my_map에 값 추가
+    with col1, stage('commercial_page.map'):
+        # 지도 생성 ((지표, 분기)별로 렌더링한 HTML을 캐시해 두고 재사용, 매출은 상권 경계를 색으로 표시)
+        map_html = maps.map_cache.get(board, option, load_boundaries(), (year, quarter))
 
         # Streamlit에 Folium 맵 표시
-        folium_static(m, width=600)
+        components.html(map_html, height=maps.MAP_HEIGHT + 10, width=600)
 
-        st.caption('2023년 3분기 기준')
+        st.caption(f'{rankings.quarter_label(year, quarter)} 기준')
+
+# 상권별 분석 차트 로드 함수 (데이터가 다시 로드될 때만 새로 만듦)
+@stage('load.district_charts')
+def load_district_charts(streamlit_index, quarter_index):
+    return charts.get_district_charts(streamlit_index, quarter_index)
+
+# 지표 증감 문자열 (직전 분기 자료가 없으면 표시하지 않음)
+def format_delta(value, unit):
+    return None if pd.isna(value) else f"{value:,.0f}{unit}"
 
 # 상권별 분석 페이지 렌더링 함수
-def AnalysisbyCommercialArea_page(streamlit_df, selected_TRDAR_CD_N, quarter_df):
+@stage('AnalysisbyCommercialArea_page')
+def AnalysisbyCommercialArea_page(streamlit_index, selected_TRDAR_CD_N, quarter_index, ranking_table):
 
     st.markdown("<h2 style='text-align: center;'>상권별 분석</h2>", unsafe_allow_html=True)
     st.caption('2023년 3분기 기준')
 
     # 3분기 데이터만 필터링
-    streamlit_df_3 = streamlit_df.loc[(streamlit_df['기준_년'] == 2023) & (streamlit_df['기준_분기'] == 3), :]
-    selected_streamlit_df_3 = streamlit_df_3[streamlit_df_3['상권_코드_명'] == selected_TRDAR_CD_N]
+    selected_streamlit_df_3 = streamlit_index.get(2023, 3, selected_TRDAR_CD_N)
 
     if not selected_streamlit_df_3.empty:
-        # meteric 값
-        formatted_sales = streamlit_df_3[streamlit_df_3['상권_코드_명'] == selected_TRDAR_CD_N]['점포당_매출액'].iloc[0]
-        count_store = streamlit_df_3[streamlit_df_3['상권_코드_명'] == selected_TRDAR_CD_N]['유사_업종_점포_수'].iloc[0]
-        floating_population = streamlit_df_3[streamlit_df_3['상권_코드_명'] == selected_TRDAR_CD_N]['총_유동인구_수'].iloc[0]
+        # meteric 값 (값, 직전 분기 대비 증감, 순위는 미리 계산해 둔 순위표에서 조회)
+        ranks = ranking_table.get(2023, 3, selected_TRDAR_CD_N)
+        sales, stores, floating = ranks.loc['매출'], ranks.loc['점포수'], ranks.loc['유동인구']
 
-        # 2분기 데이터만 필터링
-        streamlit_df_2 = streamlit_df.loc[(streamlit_df['기준_년'] == 2023) & (streamlit_df['기준_분기'] == 2), :]
-
-        # 2분기와의 차이값 계산
-        formatted_sales_diff = formatted_sales - streamlit_df_2[streamlit_df_2['상권_코드_명'] == selected_TRDAR_CD_N]['점포당_매출액'].iloc[0]
-        count_store_diff = count_store - streamlit_df_2[streamlit_df_2['상권_코드_명'] == selected_TRDAR_CD_N]['유사_업종_점포_수'].iloc[0]
-        floating_population_diff = floating_population - streamlit_df_2[streamlit_df_2['상권_코드_명'] == selected_TRDAR_CD_N]['총_유동인구_수'].iloc[0]
+        def rank_text(row):
+            return f"강남구 상권 중 {row['순위']:.0f}위 (백분위 {row['백분위']:.0f})"
 
         # 상단 col
         col1, col2, col3 = st.columns(3)
-        col1.metric("매출액", f"{formatted_sales:,.0f}원", f"{formatted_sales_diff:,.0f}원", help= "2023년 3분기 기준 해당 상권 매출 금액 / 점포수")
-        col2.metric("점포수", f"{count_store:,.0f}개", f"{count_store_diff:,.0f}개", help= "2023년 3분기 기준 해당 상권의 총 점포수입니다.")
-        col3.metric("유동인구", f"{floating_population:,.0f}명", f"{floating_population_diff:,.0f}명", help= "2023년 3분기 기준 해당 상권의 총 유동인구수입니다.")
+        col1.metric("매출액", f"{sales['값']:,.0f}원", format_delta(sales['증감'], '원'),
+                    help= f"2023년 3분기 기준 해당 상권 매출 금액 / 점포수, {rank_text(sales)}")
+        col2.metric("점포수", f"{stores['값']:,.0f}개", format_delta(stores['증감'], '개'),
+                    help= f"2023년 3분기 기준 해당 상권의 총 점포수입니다. {rank_text(stores)}")
+        col3.metric("유동인구", f"{floating['값']:,.0f}명", format_delta(floating['증감'], '명'),
+                    help= f"2023년 3분기 기준 해당 상권의 총 유동인구수입니다. {rank_text(floating)}")
 
         # 공백 추가
         st.empty()
 
         # 하단 col
-        selected_3 = quarter_df.loc[(quarter_df['기준_년'] == 2023) & 
-                                    (quarter_df['기준_분기'] == 3) & 
-                                    (quarter_df['상권_코드_명'] == selected_TRDAR_CD_N), :]
-        
-        selected = streamlit_df[streamlit_df['상권_코드_명'] == selected_TRDAR_CD_N]
+        selected_3 = quarter_index.get(2023, 3, selected_TRDAR_CD_N)
 
+        # 상권별 차트 (요일/성별/연령대 테이블은 미리 계산, 차트는 상권별로 캐시)
+        district_charts = load_district_charts(streamlit_index, quarter_index)
+
+        def show_chart(name):
+            with stage(f'AnalysisbyCommercialArea_page.{name}'):
+                st.plotly_chart(district_charts.figure(name, selected_TRDAR_CD_N, 2023, 3))
 
         tab1, tab2, tab3, tab4 = st.tabs(["📈 매출", "🚉 유동인구", "👨‍👨‍👧‍👦 상주인구", "🏬 점포수"])
 
         with tab1:
             # 분기별 매출 추이
             st.subheader("분기별 매출 추이")
-            fig_quarterly_sales = px.line(selected, x='기준_년분기', y='점포당_매출액')
-            fig_quarterly_sales.update_layout(xaxis=dict(tickangle=0), autosize=True, width=1000)
-            fig_quarterly_sales.update_yaxes(title="매출액")
-            st.plotly_chart(fig_quarterly_sales)
+            show_chart('quarterly_sales')
 
             # 시간대 및 요일별 매출
             st.subheader("시간대 및 요일별 매출")
             col1, col2 = st.columns([1,1])
 
             with col1:
-                fig_time_sales = px.bar(selected_3, x='시간대', y='시간대별_점포당_매출액', title='시간대별 매출', width=500)
-                fig_time_sales.update_layout(xaxis=dict(tickangle=0), autosize=True)
-                fig_time_sales.update_yaxes(title_text='매출액')  # y 축 이름 변경
-                st.plotly_chart(fig_time_sales)
+                show_chart('time_sales')
 
             with col2:
-                week_sale_data = selected_streamlit_df_3[['상권_코드_명', 
-                                                        '점포당_월요일_매출액', 
-                                                        '점포당_화요일_매출액', 
-                                                        '점포당_수요일_매출액', 
-                                                        '점포당_목요일_매출액', 
-                                                        '점포당_금요일_매출액',
-                                                        '점포당_토요일_매출액',
-                                                        '점포당_일요일_매출액']]
-                            
-                # 월요일 매출액 컬럼 이름 변경
-                week_sale_data = week_sale_data.rename(columns={'점포당_월요일_매출액': '월요일',
-                                                                '점포당_화요일_매출액': '화요일',
-                                                                '점포당_수요일_매출액': '수요일',
-                                                                '점포당_목요일_매출액': '목요일',
-                                                                '점포당_금요일_매출액': '금요일',
-                                                                '점포당_토요일_매출액': '토요일',
-                                                                '점포당_일요일_매출액': '일요일'})
-                # 요일 데이터
-                week_sale_data = pd.melt(week_sale_data, 
-                                        id_vars=['상권_코드_명'], 
-                                        value_vars=['월요일', '화요일', '수요일', '목요일', '금요일', '토요일', '일요일'], 
-                                        var_name='요일', 
-                                        value_name='매출_금액')
-
-                fig_week_sales = px.bar(week_sale_data, x='요일', y='매출_금액', title='요일별 매출', width=500)
-                fig_week_sales.update_layout(xaxis=dict(tickangle=0), autosize=True)
-                fig_week_sales.update_yaxes(title_text='매출액')  # y 축 이름 변경
-                st.plotly_chart(fig_week_sales)
+                show_chart('week_sales')
 
             # demo
             st.subheader("성별 및 연령대별 매출")
             col1, col2 = st.columns([1,1])
 
             with col1:
-
-                gender_data = selected_streamlit_df_3[['상권_코드_명', '점포당_남성_매출_금액', '점포당_여성_매출_금액']]
-                # '성별' 열 추가 및 데이터 재구성
-                gender_data = pd.melt(gender_data, 
-                                    id_vars=['상권_코드_명'], 
-                                    value_vars=['점포당_남성_매출_금액', '점포당_여성_매출_금액'], 
-                                    var_name='성별', 
-                                    value_name='매출_금액')
-                # 파이차트 생성
-                gender_sale = px.pie(gender_data, values='매출_금액', names='성별', title='성별 매출 비율', width=500)
-
-                # 레이아웃 수정하여 범례를 왼쪽으로 옮기기
-                gender_sale.update_layout(legend=dict(
-                    x=0,  # x 위치를 0으로 설정하여 왼쪽으로 옮김
-                    y=1.1  # y 위치 조정           
-                ))
-
-                # 그래프 출력
-                st.plotly_chart(gender_sale)
+                show_chart('gender_sales')
 
             with col2:
-                # 연령별 그래프
-                age_data = selected_streamlit_df_3[['상권_코드_명', 
-                                                    '연령대_10_매출_금액', 
-                                                    '연령대_20_매출_금액', 
-                                                    '연령대_30_매출_금액', 
-                                                    '연령대_40_매출_금액', 
-                                                    '연령대_50_매출_금액', 
-                                                    '연령대_60_이상_매출_금액']]
-                
-                # 연령대 컬럼 이름 변경
-                age_data = age_data.rename(columns={'연령대_10_매출_금액': '10대',
-                                                    '연령대_20_매출_금액': '20대',
-                                                    '연령대_30_매출_금액': '30대',
-                                                    '연령대_40_매출_금액': '40대',
-                                                    '연령대_50_매출_금액': '50대',
-                                                    '연령대_60_이상_매출_금액': '60대 이상'})
-                
-                # 데이터 재구성 (열 변환)
-                age_data = age_data.melt(id_vars='상권_코드_명', var_name='연령대', value_name='매출_금액')
-
-                age_sale = px.bar(age_data, x='연령대', y='매출_금액', title='연령대별 매출 금액', width=500)
-                age_sale.update_yaxes(title_text='매출액')  # y 축 이름 변경
-                st.plotly_chart(age_sale)
+                show_chart('age_sales')
         
         with tab2:
             st.subheader("분기별 유동인구 수 추이")
-            fig_quarterly_population = px.line(selected, x='기준_년분기', y='총_유동인구_수')
-            fig_quarterly_population.update_layout(xaxis=dict(tickangle=0), autosize=True, width=1000)
-            fig_quarterly_population.update_yaxes(title_text='총 유동인구 수')  # y 축 이름 변경
-            st.plotly_chart(fig_quarterly_population)
+            show_chart('quarterly_population')
 
             # 시간대 및 요일별 매출
             st.subheader("시간대 및 요일별 유동인구 수")
             col1, col2 = st.columns(2)
 
             with col1:
-                fig_time_population = px.bar(selected_3, x='시간대', y='시간대_유동인구_수', title='시간대별 유동인구 수', width=500)
-                fig_time_population.update_layout(xaxis=dict(tickangle=0), autosize=True)
-                fig_time_population.update_yaxes(title_text='유동인구 수')  # y 축 이름 변경
-                st.plotly_chart(fig_time_population)
+                show_chart('time_population')
 
             with col2:
-
-                week_floating_population_data = selected_streamlit_df_3[['상권_코드_명', 
-                                                        '월요일_유동인구_수', 
-                                                        '화요일_유동인구_수', 
-                                                        '수요일_유동인구_수', 
-                                                        '목요일_유동인구_수', 
-                                                        '금요일_유동인구_수',
-                                                        '토요일_유동인구_수',
-                                                        '일요일_유동인구_수']]
-                
-                # 월요일 매출액 컬럼 이름 변경
-                week_floating_population_data = week_floating_population_data.rename(columns={'월요일_유동인구_수': '월요일',
-                                                                                            '화요일_유동인구_수': '화요일',
-                                                                                            '수요일_유동인구_수': '수요일',
-                                                                                            '목요일_유동인구_수': '목요일',
-                                                                                            '금요일_유동인구_수': '금요일',
-                                                                                            '토요일_유동인구_수': '토요일',
-                                                                                            '일요일_유동인구_수': '일요일'})
-                
-                # 요일 데이터
-                week_floating_population_data = pd.melt(week_floating_population_data, 
-                                                        id_vars=['상권_코드_명'], 
-                                                        value_vars=['월요일', 
-                                                                    '화요일', 
-                                                                    '수요일', 
-                                                                    '목요일', 
-                                                                    '금요일',
-                                                                    '토요일',
-                                                                    '일요일'], 
-                                                        var_name='요일', 
-                                                        value_name='유동인구 수')
-                fig_week_floating = px.bar(week_floating_population_data, x='요일', y='유동인구 수', title='요일별 유동인구 수', width=500)
-                fig_week_floating.update_layout(xaxis=dict(tickangle=0), autosize=True)
-                st.plotly_chart(fig_week_floating)
+                show_chart('week_floating')
 
             # demo
             st.subheader("성별 및 연령대별 유동인구 수")
             col1, col2 = st.columns(2)
 
             with col1:
-                gender_floating_data = selected_streamlit_df_3[['상권_코드_명', '남성_유동인구_수', '여성_유동인구_수']]
-                # '성별' 열 추가 및 데이터 재구성
-                gender_floating_data = pd.melt(gender_floating_data, 
-                                    id_vars=['상권_코드_명'], 
-                                    value_vars=['남성_유동인구_수', '여성_유동인구_수'], 
-                                    var_name='성별', 
-                                    value_name='유동인구 수')
-                # 파이차트 생성
-                gender_floating = px.pie(gender_floating_data, values='유동인구 수', names='성별', title='성별 유동인구 비율', width=500)
-
-                # 레이아웃 수정하여 범례를 왼쪽으로 옮기기
-                gender_floating.update_layout(legend=dict(
-                    x=0,  # x 위치를 0으로 설정하여 왼쪽으로 옮김
-                    y=1.1  # y 위치 조정
-                ))
-
-                # 그래프 출력
-                st.plotly_chart(gender_floating)
+                show_chart('gender_floating')
 
             with col2:
-                # 연령별 그래프
-                age_floating_data = selected_streamlit_df_3[['상권_코드_명', 
-                                                    '연령대_10_유동인구_수', 
-                                                    '연령대_20_유동인구_수', 
-                                                    '연령대_30_유동인구_수', 
-                                                    '연령대_40_유동인구_수', 
-                                                    '연령대_50_유동인구_수', 
-                                                    '연령대_60_이상_유동인구_수']]
-                
-                # 연령대 컬럼 이름 변경
-                age_floating_data = age_floating_data.rename(columns={'연령대_10_유동인구_수': '10대',
-                                                                '연령대_20_유동인구_수': '20대',
-                                                                '연령대_30_유동인구_수': '30대',
-                                                                '연령대_40_유동인구_수': '40대',
-                                                                '연령대_50_유동인구_수': '50대',
-                                                                '연령대_60_이상_유동인구_수': '60대 이상'})
-
-                # 데이터 재구성 (열 변환)
-                age_floating_data = age_floating_data.melt(id_vars='상권_코드_명', var_name='연령대', value_name='유동인구 수')
-
-                age_floating_pop = px.bar(age_floating_data, x='연령대', y='유동인구 수', title='연령대별 유동인구 수', width=500)
-                st.plotly_chart(age_floating_pop)
+                show_chart('age_floating')
 
         with tab3:
             # demo
@@ -363,85 +210,93 @@ def AnalysisbyCommercialArea_page(streamlit_df, selected_TRDAR_CD_N, quarter_df)
             col1, col2 = st.columns(2)
 
             with col1:
-                gender_resident_data = selected_streamlit_df_3[['상권_코드_명', '남성_상주인구_수', '여성_상주인구_수']]
-                # '성별' 열 추가 및 데이터 재구성
-                gender_resident_data = pd.melt(gender_resident_data, 
-                                    id_vars=['상권_코드_명'], 
-                                    value_vars=['남성_상주인구_수', '여성_상주인구_수'], 
-                                    var_name='성별', 
-                                    value_name='상주인구 수')
-                # 파이차트 생성
-                gender_resident = px.pie(gender_resident_data, values='상주인구 수', names='성별', title='성별 상주인구 비율', width=500)
-
-                # 레이아웃 수정하여 범례를 왼쪽으로 옮기기
-                gender_resident.update_layout(legend=dict(
-                    x=0,  # x 위치를 0으로 설정하여 왼쪽으로 옮김
-                    y=1.1  # y 위치 조정
-                ))
-
-                # 그래프 출력
-                st.plotly_chart(gender_resident)
+                show_chart('gender_resident')
 
             with col2:
-                # 연령별 그래프
-                age_resident_data = selected_streamlit_df_3[['상권_코드_명', 
-                                                    '연령대_10_상주인구_수', 
-                                                    '연령대_20_상주인구_수', 
-                                                    '연령대_30_상주인구_수', 
-                                                    '연령대_40_상주인구_수', 
-                                                    '연령대_50_상주인구_수', 
-                                                    '연령대_60_이상_상주인구_수']]
-                
-                # 연령대 컬럼 이름 변경
-                age_resident_data = age_resident_data.rename(columns={'연령대_10_상주인구_수': '10대',
-                                                                '연령대_20_상주인구_수': '20대',
-                                                                '연령대_30_상주인구_수': '30대',
-                                                                '연령대_40_상주인구_수': '40대',
-                                                                '연령대_50_상주인구_수': '50대',
-                                                                '연령대_60_이상_상주인구_수': '60대 이상'})
-
-                # 데이터 재구성 (열 변환)
-                age_resident_data = age_resident_data.melt(id_vars='상권_코드_명', var_name='연령대', value_name='상주인구 수')
-
-                age_resident = px.bar(age_resident_data, x='연령대', y='상주인구 수', title='연령대별 상주인구 수', width=500)
-                st.plotly_chart(age_resident)
+                show_chart('age_resident')
         
         with tab4:
-            # 첫 번째 그래프 생성
-            store = px.line(selected, x='기준_년분기', y='유사_업종_점포_수', title='점포수', width=1000)
-            # 첫 번째 그래프의 Y축 범위 조정
-            store.update_layout(yaxis=dict(range=[0, selected['유사_업종_점포_수'].max() + 10]), autosize=True)
-
-            # 두 번째 그래프 생성
-            store_openclose = px.bar(selected, x='기준_년분기', y=['개업_점포_수', '폐업_점포_수'], barmode='group', title='개·폐업수', width=1000)
-
-            # 두 번째 그래프를 첫 번째 그래프에 추가
-            for data in store_openclose.data:
-                store.add_trace(data)
-
-            # 그래프 출력
-            st.plotly_chart(store)
+            # 점포수 + 개·폐업수
+            show_chart('store')
             
     else:
         st.error("해당 상권의 3분기 데이터가 없습니다.", icon="🚨")
         st.write("다른 상권을 선택해주세요")
 
-def Predict(quarter_df, Predict_selected_ADSTRD_CD, Predict_selected_TRDAR_CD_N):
+# 여러 상권 비교 페이지 렌더링 함수
+# 선택한 상권 전체를 한 번에 집계해서 (상권마다 페이지를 그리지 않음) 지표 표와 겹친 차트로 표시
+@stage('compare_page')
+def compare_page(streamlit_index, districts, quarter_index):
+    st.markdown("<h2 style='text-align: center;'>상권 비교</h2>", unsafe_allow_html=True)
+    st.caption('2023년 3분기 기준')
+
+    if len(districts) < 2:
+        st.info("비교할 상권을 두 개 이상 선택해주세요.")
+        return
+
+    district_charts = load_district_charts(streamlit_index, quarter_index)
+
+    with stage('compare_page.summary'):
+        summary = district_charts.comparison(districts, 2023, 3).summary()
+        st.dataframe(summary.style.format('{:,.0f}', na_rep='-'), use_container_width=True)
+        st.caption("증감은 직전 분기 대비입니다. 매출액 = 해당 상권 매출 금액 / 점포수")
+
+    def show_chart(name):
+        with stage(f'compare_page.{name}'):
+            st.plotly_chart(district_charts.compare_figure(name, districts, 2023, 3))
+
+    tab1, tab2, tab3, tab4 = st.tabs(["📈 매출", "🚉 유동인구", "👨‍👨‍👧‍👦 상주인구", "🏬 점포수"])
+
+    with tab1:
+        show_chart('quarterly_sales')
+        col1, col2 = st.columns(2)
+        with col1:
+            show_chart('time_sales')
+            show_chart('gender_sales')
+        with col2:
+            show_chart('week_sales')
+            show_chart('age_sales')
+
+    with tab2:
+        show_chart('quarterly_population')
+        col1, col2 = st.columns(2)
+        with col1:
+            show_chart('time_population')
+            show_chart('gender_floating')
+        with col2:
+            show_chart('week_floating')
+            show_chart('age_floating')
+
+    with tab3:
+        col1, col2 = st.columns(2)
+        with col1:
+            show_chart('gender_resident')
+        with col2:
+            show_chart('age_resident')
+
+    with tab4:
+        show_chart('store')
+
+# 모델 로드 함수 (프로세스에서 한 번만 로드하고, 모델 파일이 바뀌면 다시 로드)
+@stage('load.model')
+def load_model():
+    return model_registry.registry.get()
+
+@stage('Predict')
+def Predict(quarter_index, model_entry, Predict_selected_ADSTRD_CD, Predict_selected_TRDAR_CD_N):
     st.markdown("<h2>매출 예측</h2>", unsafe_allow_html=True)
     st.markdown("<h5>각 항목에 해당하는 값을 입력해주세요</h5>", unsafe_allow_html=True)
     st.caption('2023년 3분기 기준 해당 상권의 값이 설정되어 있습니다.', help='논현목련공원은 2023년 3분기 자료가 없어 2023년 2분기 기준으로 설정되어있습니다.')
  
+    quarter_df = quarter_index.df
+
     if Predict_selected_TRDAR_CD_N == '논현목련공원':
-        selected_3 = quarter_df.loc[(quarter_df['기준_년'] == 2023) & 
-                                        (quarter_df['기준_분기'] == 2) & 
-                                        (quarter_df['상권_코드_명'] == Predict_selected_TRDAR_CD_N), :]
+        selected_3 = quarter_index.get(2023, 2, Predict_selected_TRDAR_CD_N)
         
     else:
-        selected_3 = quarter_df.loc[(quarter_df['기준_년'] == 2023) & 
-                                    (quarter_df['기준_분기'] == 3) & 
-                                    (quarter_df['상권_코드_명'] == Predict_selected_TRDAR_CD_N), :]
+        selected_3 = quarter_index.get(2023, 3, Predict_selected_TRDAR_CD_N)
     
-    with st.container(border=True):
+    with st.container(border=True), stage('Predict.inputs'):
         col1, col2 = st.columns(2)
         with col1:
             year = st.selectbox("기준 년도", list(range(2023, 2029)))
@@ -551,88 +406,49 @@ def Predict(quarter_df, Predict_selected_ADSTRD_CD, Predict_selected_TRDAR_CD_N)
         
 
 
-    # 사용자 입력값을 딕셔너리로 변환
-    user_data = {
-        '기준_년': [year] * 6,
-        '시간대': ['00_06', '06_11', '11_14', '14_17', '17_21', '21_24'],
+    # 사용자 입력값을 시간대별 6행의 DataFrame으로 변환 (비율은 % 입력값을 학습 데이터와 같은 0~1 값으로)
+    user_data = pd.DataFrame({
+        '기준_년': year,
+        '기준_분기': quarter,
+        '시간대': hour_ranges,
         '시간대_유동인구_수': floating_values,
-        '총_직장_인구_수': [working_total] * 6,
-        '연령대_10_직장인구_비율': [working_population_ratios[0]] * 6,
-        '연령대_20_직장인구_비율': [working_population_ratios[1]] * 6,
-        '연령대_30_직장인구_비율': [working_population_ratios[2]] * 6,
-        '연령대_40_직장인구_비율': [working_population_ratios[3]] * 6,
-        '연령대_50_직장인구_비율': [working_population_ratios[4]] * 6,
-        '연령대_60_이상_직장인구_비율': [working_population_ratios[4]] * 6,
-        '총_상주인구_수': [living_total] * 6,
-        '연령대_10_상주인구_비율': [living_ratios[0]] * 6,
-        '연령대_20_상주인구_비율': [living_ratios[1]] * 6,
-        '연령대_30_상주인구_비율': [living_ratios[2]] * 6,
-        '연령대_40_상주인구_비율': [living_ratios[3]] * 6,
-        '연령대_50_상주인구_비율': [living_ratios[4]] * 6,
-        '연령대_60_이상_상주인구_비율': [living_ratios[5]] * 6,
-        '총_가구_수': [house] * 6,
-        '월_평균_소득_금액': [income] * 6,
-        '지출_총금액' : [spending] * 6,
-        '집객시설_수' : [facility] * 6,
-        '유사_업종_점포_수': [store] * 6,
-        '개업_점포_수': [open] * 6,
-        '폐업_점포_수' : [close] * 6
-    }
-    user_data = pd.DataFrame(user_data)
-    user_data['편의점_밀도'] = user_data['유사_업종_점포_수']/selected_3['영역_면적'].unique()
-    user_data['편의점_밀도'] = user_data['편의점_밀도'].round(10) 
-    
-    # 분기에 해당하는 컬럼을 추가하고 초기화
-    for i in range(1, 5):
-        user_data[f'기준_분기_{i}'] = 0
-
-    # 해당 분기에 해당하는 컬럼에 값을 할당
-    user_data[f'기준_분기_{quarter}'] = 1
-
-    # 상권코드명
-    for code_name in quarter_df['상권_코드_명'].unique():
-        user_data[f'상권_코드_명_{code_name}'] = 0
-
-    user_data[f'상권_코드_명_{Predict_selected_TRDAR_CD_N}'] = 1
-
-    # 행정동 코드 명
-    for code_name in quarter_df['행정동_코드_명'].unique():
-        user_data[f'행정동_코드_명_{code_name}'] = 0
-
-    selected_code_name = selected_3['행정동_코드_명'].unique()[0]
-    user_data[f'행정동_코드_명_{selected_code_name}'] = 1
-
-    # 상권 구분 코드 명
-    for code_name in quarter_df['상권_구분_코드_명'].unique():
-        user_data[f'상권_구분_코드_명_{code_name}'] = 0
-
-    selected_code_name = selected_3['상권_구분_코드_명'].unique()[0]
-    user_data[f'상권_구분_코드_명_{selected_code_name}'] = 1
-
-    # 특수 문자를 제거하고 언더스코어(_)로 대체합니다.
-    user_data.columns = [re.sub(r'\W+', '_', col) for col in user_data.columns]
+        '총_직장_인구_수': working_total,
+        '연령대_10_직장인구_비율': working_population_ratios[0] / 100,
+        '연령대_20_직장인구_비율': working_population_ratios[1] / 100,
+        '연령대_30_직장인구_비율': working_population_ratios[2] / 100,
+        '연령대_40_직장인구_비율': working_population_ratios[3] / 100,
+        '연령대_50_직장인구_비율': working_population_ratios[4] / 100,
+        '연령대_60_이상_직장_인구_비율': working_population_ratios[5] / 100,
+        '총_상주인구_수': living_total,
+        '연령대_10_상주인구_비율': living_ratios[0] / 100,
+        '연령대_20_상주인구_비율': living_ratios[1] / 100,
+        '연령대_30_상주인구_비율': living_ratios[2] / 100,
+        '연령대_40_상주인구_비율': living_ratios[3] / 100,
+        '연령대_50_상주인구_비율': living_ratios[4] / 100,
+        '연령대_60_이상_상주인구_비율': living_ratios[5] / 100,
+        '총_가구_수': house,
+        '월_평균_소득_금액': income,
+        '지출_총금액' : spending,
+        '집객시설_수' : facility,
+        '유사_업종_점포_수': store,
+        '개업_점포_수': open,
+        '폐업_점포_수' : close,
+        '상권_코드_명': Predict_selected_TRDAR_CD_N,
+        '행정동_코드_명': selected_3['행정동_코드_명'].iloc[0],
+        '상권_구분_코드_명': selected_3['상권_구분_코드_명'].iloc[0],
+        '영역_면적': selected_3['영역_면적'].iloc[0]
+    })
+    user_data['편의점_밀도'] = (user_data['유사_업종_점포_수'] / user_data['영역_면적']).round(10)
 
     if st.button('예측하기'):
-        # 모델과 lambda 값을 로드
-        model, lambda_ = joblib.load("model/best_lgbm_regression_model.pkl")
-        # 범주형 변수와 숫자형 변수 구분
-        cat_cols = ['시간대', '상권_구분_코드_명', '상권_코드_명', '행정동_코드_명']
-        num_cols = user_data.columns.difference(cat_cols).tolist()
-
-        ## 범주형 변수 더미화
-        user_data = pd.get_dummies(user_data, columns=['시간대'])
-
-        ## 더미 변수화된 값이 불리언 형태로 나왔다면 0과 1로 변환
-        user_data.replace({True: 1, False: 0}, inplace=True)
-
-        ## 숫자형 변수 정규화
-        scaler = StandardScaler()
-        user_data[num_cols] = scaler.fit_transform(user_data[num_cols])
-
-        #예측
-        pred = model.predict(user_data)
-        # 예측 결과를 원래의 스케일로 되돌리기 위해 역 Box-Cox 변환 적용
-        prediction = inv_boxcox(pred, lambda_)
+        ## 모델 컬럼 순서의 CSR 입력 행렬 생성 (범주형 변수는 원-핫, 숫자형 변수는 학습 때의 통계로 정규화)
+        with stage('Predict.preprocess'):
+            X = model_entry.preprocessor.transform_sparse(user_data)
+
+        #예측 (예측 결과를 원래의 스케일로 되돌리기 위해 역 Box-Cox 변환까지 적용, 같은 입력은 캐시에서 반환)
+        # 분위수 모델이 있으면 같은 입력 행렬로 시간대별 예측 구간도 함께 계산
+        with stage('Predict.predict'):
+            prediction, prediction_range = model_registry.prediction_cache.predict_range(model_entry, X)
         
         # 예측 결과(prediction)를 DataFrame으로 변환
         prediction_df = pd.DataFrame(prediction, columns=['추정_매출'])
@@ -649,16 +465,124 @@ def Predict(quarter_df, Predict_selected_ADSTRD_CD, Predict_selected_TRDAR_CD_N)
         # 예측 결과와 시간대를 함께 출력
         predict_total_sale = format(int(prediction_df['매장별 평균 추정 매출'].sum()), ',')
         st.write(f'{Predict_selected_TRDAR_CD_N} 상권의 {year}년 {quarter}분기 추정 매출액은 {predict_total_sale}원입니다.')
-        predict_time_sales = px.bar(prediction_df, x='시간대', y='추정_매출', title='시간대별 추정 매출')
-        predict_time_sales.update_layout(xaxis=dict(tickangle=0), autosize=True)
-        predict_time_sales.update_yaxes(title_text='추정 매출액')
-        st.plotly_chart(predict_time_sales)
+
+        # 예측 구간 (가장 낮은/높은 분위수, 전체 구간은 시간대별 구간의 합)
+        labels = [model_registry.quantile_label(quantile) for quantile in model_entry.quantiles]
+        if labels:
+            low, high = prediction_range[:, 0] / store, prediction_range[:, -1] / store
+            st.write(f'예측 구간({labels[0]}~{labels[-1]})은 {low.sum():,.0f}원 ~ {high.sum():,.0f}원입니다.')
+            st.caption('분위수 모델로 추정한 범위로, 시간대별 구간을 더한 값입니다.')
+
+        with stage('Predict.chart'):
+            predict_time_sales = px.bar(prediction_df, x='시간대', y='추정_매출', title='시간대별 추정 매출')
+            if labels:
+                for label, values in ((labels[0], prediction_range[:, 0]), (labels[-1], prediction_range[:, -1])):
+                    predict_time_sales.add_scatter(x=prediction_df['시간대'], y=values, mode='markers', name=label,
+                                                   marker=dict(symbol='line-ew-open', size=24, color='black'))
+            predict_time_sales.update_layout(xaxis=dict(tickangle=0), autosize=True)
+            predict_time_sales.update_yaxes(title_text='추정 매출액')
+            st.plotly_chart(predict_time_sales)
+
+    # 민감도 분석 (위의 입력값을 기준으로 한두 항목의 값 범위 전체를 한 번에 예측)
+    with st.expander('민감도 분석'), stage('Predict.sweep'):
+        show_sweep(quarter_df, model_entry, user_data)
+
+# 민감도 분석: 항목 하나는 곡선, 두 개는 히트맵으로 점포당 추정 매출 표시
+def show_sweep(quarter_df, model_entry, user_data):
+    names = list(sensitivity.SWEEP_VARIABLES)
+    col1, col2 = st.columns(2)
+    with col1:
+        first = st.selectbox('항목', names, index=names.index('편의점 점포 수'))
+    with col2:
+        second = st.selectbox('두 번째 항목 (선택)', ['없음'] + [name for name in names if name != first])
+    selected = [first] if second == '없음' else [first, second]
+    points = sensitivity.CURVE_POINTS if len(selected) == 1 else sensitivity.HEATMAP_POINTS
+
+    sweeps = []
+    for name in selected:
+        column, _ = sensitivity.SWEEP_VARIABLES[name]
+        low, high = round(min(quarter_df[column])), round(max(quarter_df[column]))
+        value_range = st.slider(f'{name} 범위', low, high, (low, high))
+        sweeps.append((name, sensitivity.sweep_values(*value_range, points)))
+
+    if not st.button('민감도 분석하기'):
+        return
+
+    result = sensitivity.sweep_predict(model_entry, user_data, sweeps)
+    if len(selected) == 1:
+        fig = px.line(result, x=first, y='점포당_추정_매출', markers=True, title=f'{first}에 따른 점포당 추정 매출')
+        fig.add_vline(x=sensitivity.current_value(user_data, first), line_dash='dash', annotation_text='현재 값')
+    else:
+        heatmap = result.pivot(index=second, columns=first, values='점포당_추정_매출')
+        fig = px.imshow(heatmap, origin='lower', aspect='auto', color_continuous_scale='YlOrRd',
+                        labels={'color': '점포당 추정 매출'}, title=f'{first} x {second}에 따른 점포당 추정 매출')
+    fig.update_layout(autosize=True)
+    st.plotly_chart(fig)
+    st.caption(f"{len(result):,}개 조합 ({len(result) * len(user_data):,}행)을 한 번에 예측했습니다.")
+
+# 상권 영역 공간 인덱스 로드 함수
+@stage('load.area_index')
+def load_area_index():
+    return areas.get_area_index()
+
+# 좌표로 상권 찾기 (입력한 좌표를 포함하는 상권 또는 가장 가까운 상권 중 데이터가 있는 상권)
+# 찾은 (행정동, 상권명)을 반환하고, 좌표를 입력하지 않았으면 (None, None)
+def locate_district(quarter_index):
+    with st.expander('좌표로 상권 찾기'):
+        lat = st.number_input('위도', value=None, format='%.6f', placeholder='37.517200')
+        lon = st.number_input('경도', value=None, format='%.6f', placeholder='127.047300')
+        if lat is None or lon is None:
+            return None, None
+
+        area_index = load_area_index()
+        located = area_index.locate(lat, lon)
+        nearby = area_index.neighbors(lat, lon)
+
+        if located.empty:
+            st.write("해당 좌표를 포함하는 상권이 없습니다.")
+        else:
+            st.write(f"해당 좌표의 상권: {', '.join(located['상권_코드_명'])}")
+        if not nearby.empty:
+            st.caption("주변 상권: " + ", ".join(f"{name}({distance:,.0f}m)" for name, distance
+                                                 in zip(nearby['상권_코드_명'], nearby['거리'])))
+
+        # 예측 데이터가 있는 상권 중 가장 가까운 상권 선택
+        candidates = list(located['상권_코드_명']) + list(nearby['상권_코드_명'])
+        known = [name for name in candidates if not quarter_index.district(name).empty]
+        if not known:
+            st.error("주변에 예측 데이터가 있는 상권이 없습니다.", icon="🚨")
+            return None, None
+        if known[0] not in set(located['상권_코드_명']):
+            st.caption(f"예측 데이터가 있는 가장 가까운 상권({known[0]})으로 설정합니다.")
+        return quarter_index.district(known[0])['행정동_코드_명'].iloc[0], known[0]
+
+# 선택지 목록에서 기본값의 위치 (없으면 첫 번째)
+def option_index(options, value):
+    options = list(options)
+    return options.index(value) if value in options else 0
+
+# 디버그 패널 (이번 실행의 구간별 시간/메모리 증감, 누적 지표)
+def show_debug_panel(records):
+    if not (DEBUG or st.query_params.get('debug') == '1'):
+        return
+
+    with st.sidebar.expander('디버그: 실행 시간', expanded=True):
+        st.dataframe(pd.DataFrame({
+            '구간': ['　' * record['depth'] + record['stage'] for record in records],
+            '시간(ms)': [round(record['seconds'] * 1000, 1) for record in records],
+            '메모리(MB)': [round(record['memory_bytes'] / 2**20, 1) for record in records],
+        }), hide_index=True, use_container_width=True)
+
+        cache_stats = model_registry.prediction_cache.stats()
+        st.caption(f"메모리 {rss_bytes() / 2**20:,.0f}MB (데이터 캐시 {data_loader.dataset_cache.memory_bytes() / 2**20:,.1f}MB), "
+                   f"실행 {instrumentation.runs:,}회, "
+                   f"예측 캐시 {cache_stats['hits']:,}/{cache_stats['hits'] + cache_stats['misses']:,}회 적중")
+        st.download_button('Prometheus 지표 내려받기', instrumentation.prometheus_text(),
+                           file_name='metrics.prom', mime='text/plain')
 
 # 메인 함수
+@stage('main')
 def main():
-    quarter_df = load_quarter_data()
-    streamlit_df = load_streamlit_data()
-
     st.set_page_config(
         page_title="강남구 편의점 매출 예측 서비스",
         page_icon="🏪",
@@ -669,7 +593,7 @@ def main():
     choice = ""  # choice 변수를 미리 정의
 
     # 사이드바 메뉴
-    with st.sidebar:
+    with st.sidebar, stage('main.sidebar'):
         menu = option_menu("메뉴 선택", ['강남구 상권 분석', '상권별 분석', '매출 예측'],
                    icons=['bi bi-clipboard2-data', 'bi bi-currency-dollar', 'bi bi-graph-up-arrow'], 
                    menu_icon="cast", 
@@ -679,41 +603,63 @@ def main():
             choice = "강남구 상권 분석"
 
         elif menu == "상권별 분석":
+            # 선택된 페이지에서 사용하는 데이터만 로드
+            quarter_index = load_quarter_index(ANALYSIS_QUARTER_COLUMNS)
+
             # 행정동 선택
-            ADSTRD_CD = quarter_df['행정동_코드_명'].unique()
+            ADSTRD_CD = quarter_index.dongs()
             selected_ADSTRD_CD = st.selectbox('행정동', ADSTRD_CD)
 
             # 선택된 행정동에 해당하는 상권명 가져오기
-            TRDAR_CD_N = quarter_df[quarter_df['행정동_코드_명'] == selected_ADSTRD_CD]['상권_코드_명'].unique()
+            TRDAR_CD_N = quarter_index.districts_in(selected_ADSTRD_CD)
 
             # 상권명 선택
             selected_TRDAR_CD_N = st.selectbox('상권명', TRDAR_CD_N)
 
+            # 여러 상권 비교 (선택한 상권을 기본으로 포함)
+            compared_TRDAR_CD_N = []
+            if st.toggle('여러 상권 비교'):
+                compared_TRDAR_CD_N = st.multiselect('비교할 상권', quarter_index.districts(), default=[selected_TRDAR_CD_N],
+                                                     max_selections=MAX_COMPARE)
+
             choice = "상권별 분석"
 
         elif menu == "매출 예측":
-           # 행정동 선택
-            ADSTRD_CD = quarter_df['행정동_코드_명'].unique()
-            Predict_selected_ADSTRD_CD = st.selectbox('행정동', ADSTRD_CD)
+            quarter_index = load_quarter_index(PREDICT_COLUMNS)
+
+            # 좌표를 입력하면 해당 위치의 상권을 기본값으로 설정
+            located_dong, located_district = locate_district(quarter_index)
+
+            # 행정동 선택
+            ADSTRD_CD = quarter_index.dongs()
+            Predict_selected_ADSTRD_CD = st.selectbox('행정동', ADSTRD_CD, index=option_index(ADSTRD_CD, located_dong))
 
             # 선택된 행정동에 해당하는 상권명 가져오기
-            TRDAR_CD_N = quarter_df[quarter_df['행정동_코드_명'] == Predict_selected_ADSTRD_CD]['상권_코드_명'].unique()
+            TRDAR_CD_N = quarter_index.districts_in(Predict_selected_ADSTRD_CD)
 
             # 상권명 선택
-            Predict_selected_TRDAR_CD_N = st.selectbox('상권명', TRDAR_CD_N)
+            Predict_selected_TRDAR_CD_N = st.selectbox('상권명', TRDAR_CD_N, index=option_index(TRDAR_CD_N, located_district))
 
             choice = "매출 예측"
 
     # 페이지 보이기
     if choice == '강남구 상권 분석':
-        commercial_page(streamlit_df)
+        commercial_page(load_rankings())
+
+    elif choice == '상권별 분석' and compared_TRDAR_CD_N:
+        compare_page(load_streamlit_index(ANALYSIS_COLUMNS), compared_TRDAR_CD_N, quarter_index)
 
     elif choice == '상권별 분석':
-        AnalysisbyCommercialArea_page(streamlit_df, selected_TRDAR_CD_N, quarter_df)
+        AnalysisbyCommercialArea_page(load_streamlit_index(ANALYSIS_COLUMNS), selected_TRDAR_CD_N, quarter_index, load_rankings())
 
     elif choice == '매출 예측':
-        Predict(quarter_df, Predict_selected_ADSTRD_CD, Predict_selected_TRDAR_CD_N)
+        # 예측 버튼을 누르기 전에 모델을 미리 로드
+        Predict(quarter_index, load_model(), Predict_selected_ADSTRD_CD, Predict_selected_TRDAR_CD_N)
     
-# 메인 함수 호출
+# 메인 함수 호출 (구간별 실행 시간 기록)
 if __name__ == '__main__':
-    main()
+    instrumentation.start_run()
+    try:
+        main()
+    finally:
+        show_debug_panel(instrumentation.finish_run())
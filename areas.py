@@ -0,0 +1,166 @@
+# -*- coding:utf-8 -*-
+import os
+import math
+import argparse
+import time
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+from pyproj import Transformer
+import data_loader
+
+# 이웃 상권으로 보는 거리 (m)
+NEIGHBOR_DISTANCE = 500
+
+# 지도에 그리는 상권 경계 (강남구만, WGS84, 줌 레벨별로 단순화)
+BOUNDARY_PATH = "./data/강남구_상권_영역.parquet"
+BOUNDARY_DISTRICT = '강남구'
+BOUNDARY_COLUMNS = ['상권_코드', '상권_코드_명', '상권_구분_코드_명', '행정동_코드_명', '영역_면적']
+ZOOM_LEVELS = [11, 13, 15]
+
+# 단순화 허용 오차 계산 기준 위도 (강남구)
+BOUNDARY_LATITUDE = 37.5172
+
+# 좌표 소수점 자리수 (약 0.1m)
+COORDINATE_DIGITS = 6
+
+logger = logging.getLogger(__name__)
+
+
+# 서울시 상권 영역 공간 인덱스 (좌표 -> 포함하는 상권 + 주변 상권)
+# - 영역 폴리곤으로 STRtree를 한 번만 만들어 두고 조회마다 후보 영역만 검사
+# - 입력 좌표(위도/경도)는 영역 좌표계(미터)로 변환해서 조회
+class AreaIndex:
+    def __init__(self, area_df):
+        self.df = area_df.drop(columns='geometry').reset_index(drop=True)
+        self.geometries = shapely.from_wkb(area_df['geometry'].to_numpy())
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+        self._area = self.df['영역_면적'].to_numpy(dtype=np.float64)
+        self._to_area_crs = Transformer.from_crs("EPSG:4326", data_loader.AREA_CRS, always_xy=True)
+
+    # 위도/경도 -> 영역 좌표계의 점
+    def point(self, lat, lon):
+        return shapely.Point(*self._to_area_crs.transform(lon, lat))
+
+    # 좌표를 포함하는 상권 (관광특구처럼 겹치는 영역이 있으면 면적이 작은 상권부터)
+    def locate(self, lat, lon):
+        positions = self.tree.query(self.point(lat, lon), predicate='intersects')
+        positions = positions[np.argsort(self._area[positions], kind='stable')]
+        return self.df.iloc[positions]
+
+    # 좌표에서 distance(m) 이내의 주변 상권 (좌표를 포함하는 상권 제외, 가까운 순)
+    def neighbors(self, lat, lon, distance=NEIGHBOR_DISTANCE):
+        point = self.point(lat, lon)
+        positions = self.tree.query(point, predicate='dwithin', distance=distance)
+        distances = shapely.distance(self.geometries[positions], point)
+        order = np.argsort(distances, kind='stable')
+        positions, distances = positions[order], distances[order]
+
+        outside = distances > 0
+        result = self.df.iloc[positions[outside]].copy()
+        result['거리'] = distances[outside].round()
+        return result
+
+# 캐시를 거쳐 상권 영역 인덱스를 가져오는 함수 (스냅샷/shapefile이 바뀌면 다시 만듦)
+def get_area_index():
+    return data_loader.get_derived('areas', 'index', AreaIndex)
+
+
+# 줌 레벨에서 화면 1픽셀에 해당하는 거리 (m) = 단순화 허용 오차
+def simplify_tolerance(zoom, latitude=BOUNDARY_LATITUDE):
+    return 156543.03392 * math.cos(math.radians(latitude)) / 2 ** zoom
+
+# 영역 좌표계 폴리곤 -> WGS84 (경도, 위도) 폴리곤
+def to_wgs84(geometries):
+    transformer = Transformer.from_crs(data_loader.AREA_CRS, "EPSG:4326", always_xy=True)
+
+    def transform(coords):
+        lon, lat = transformer.transform(coords[:, 0], coords[:, 1])
+        return np.round(np.column_stack([lon, lat]), COORDINATE_DIGITS)
+
+    return shapely.transform(geometries, transform)
+
+# 상권 경계 파일 생성 (오프라인 단계)
+# 강남구 영역만 골라 줌 레벨별로 미터 단위에서 단순화한 뒤 WGS84로 변환해 geometry_{줌} 컬럼(WKB)에 저장
+def build_boundaries(path=BOUNDARY_PATH, zoom_levels=ZOOM_LEVELS):
+    area_df = data_loader.get_dataset('areas')
+    area_df = area_df[area_df['자치구_코드_명'] == BOUNDARY_DISTRICT]
+    geometries = shapely.from_wkb(area_df['geometry'].to_numpy())
+
+    boundaries = area_df[BOUNDARY_COLUMNS].reset_index(drop=True)
+    for zoom in zoom_levels:
+        simplified = shapely.simplify(geometries, simplify_tolerance(zoom), preserve_topology=True)
+        boundaries[f'geometry_{zoom}'] = shapely.to_wkb(to_wgs84(simplified))
+
+    table = pa.Table.from_pandas(boundaries, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'source_sha1'] = data_loader.file_hash(data_loader.AREA_SHP_PATH).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    # 다른 프로세스가 읽는 도중에 바뀌지 않도록 임시 파일에 쓰고 교체
+    tmp_path = path + '.tmp'
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+    return path
+
+# 줌 레벨의 상권 경계 (상권_코드_명, geometry) 읽기
+# 경계 파일을 만든 shapefile과 지금의 shapefile이 다르면 (메타데이터의 source_sha1 비교) 경계 파일을 다시 만든 뒤 읽음
+def read_boundaries(zoom, path=BOUNDARY_PATH):
+    if not data_loader.snapshot_is_fresh(data_loader.AREA_SHP_PATH, path):
+        logger.warning("상권 영역 shapefile이 바뀌어 경계 파일을 다시 만듭니다: %s", path)
+        build_boundaries(path)
+    boundaries = pd.read_parquet(path, columns=['상권_코드_명', f'geometry_{zoom}'])
+    return pd.DataFrame({'상권_코드_명': boundaries['상권_코드_명'],
+                         'geometry': shapely.from_wkb(boundaries[f'geometry_{zoom}'].to_numpy())})
+
+# 캐시를 거쳐 상권 경계를 가져오는 함수 (경계 파일이 없으면 None, 경계 파일이나 shapefile이 바뀌면 다시 읽음)
+def get_boundaries(zoom, path=BOUNDARY_PATH):
+    if not os.path.exists(path):
+        return None
+    paths = [path, data_loader.AREA_SHP_PATH] if os.path.exists(data_loader.AREA_SHP_PATH) else [path]
+    return data_loader.dataset_cache.get(('boundaries', path, zoom), paths, lambda: read_boundaries(zoom, path))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="상권 영역 도구")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    locate_parser = subparsers.add_parser('locate', help="좌표로 상권 찾기")
+    locate_parser.add_argument('lat', type=float, help="위도")
+    locate_parser.add_argument('lon', type=float, help="경도")
+    locate_parser.add_argument('--distance', type=float, default=NEIGHBOR_DISTANCE, help="주변 상권 거리 (m)")
+
+    boundary_parser = subparsers.add_parser('boundaries', help="지도용 강남구 상권 경계 파일 생성")
+    boundary_parser.add_argument('--output', default=BOUNDARY_PATH)
+    boundary_parser.add_argument('--zoom', type=int, action='append', help=f"단순화할 줌 레벨 (여러 번 지정 가능, 기본: {ZOOM_LEVELS})")
+
+    args = parser.parse_args()
+
+    if args.command == 'locate':
+        area_index = get_area_index()
+
+        start = time.perf_counter()
+        located = area_index.locate(args.lat, args.lon)
+        nearby = area_index.neighbors(args.lat, args.lon, args.distance)
+        elapsed = time.perf_counter() - start
+
+        columns = ['상권_코드_명', '상권_구분_코드_명', '자치구_코드_명', '행정동_코드_명']
+        print("포함하는 상권:" if not located.empty else "포함하는 상권이 없습니다.")
+        if not located.empty:
+            print(located[columns].to_string(index=False))
+        print(f"{args.distance:,.0f}m 이내 주변 상권:")
+        print(nearby[columns + ['거리']].to_string(index=False))
+        print(f"({len(area_index.df):,}개 영역, 조회 {elapsed * 1e6:,.0f}µs)")
+
+    elif args.command == 'boundaries':
+        zoom_levels = args.zoom or ZOOM_LEVELS
+        path = build_boundaries(args.output, zoom_levels)
+        for zoom in zoom_levels:
+            geometries = read_boundaries(zoom, path)['geometry']
+            print(f"줌 {zoom}: 허용 오차 {simplify_tolerance(zoom):.1f}m, "
+                  f"꼭짓점 {shapely.get_num_coordinates(geometries.to_numpy()).sum():,}개")
+        print(f"{len(geometries)}개 상권 -> {path} ({os.path.getsize(path):,} bytes)")
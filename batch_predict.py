@@ -0,0 +1,81 @@
+# -*- coding:utf-8 -*-
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import data_loader
+import features
+import model_registry
+
+# 예측 대상 기간 기본값
+START_YEAR = 2023
+END_YEAR = 2028
+
+# 상권 식별 컬럼
+ID_COLUMNS = ['상권_코드_명', '행정동_코드_명', '상권_구분_코드_명']
+
+# 예측 대상 (기준_년, 기준_분기) 목록
+def make_periods(start_year=START_YEAR, end_year=END_YEAR):
+    return [(year, quarter) for year in range(start_year, end_year + 1) for quarter in range(1, 5)]
+
+# 상권별 기준 행 (가장 최근 분기의 시간대별 6행)
+# 매출 예측 페이지의 기본값과 같음 (2023년 3분기, 자료가 없는 상권은 그 이전 분기)
+def latest_rows(quarter_df):
+    period = quarter_df['기준_년'] * 10 + quarter_df['기준_분기']
+    latest = period.groupby(quarter_df['상권_코드_명'], observed=True).transform('max')
+    return quarter_df[period == latest]
+
+# 기준 행 x 예측 기간으로 입력 데이터 생성
+def build_batch(base, periods):
+    periods = np.asarray(periods)
+    batch = base.iloc[np.repeat(np.arange(len(base)), len(periods))].reset_index(drop=True)
+    batch['기준_년'] = np.tile(periods[:, 0], len(base))
+    batch['기준_분기'] = np.tile(periods[:, 1], len(base))
+    return features.add_density(batch)
+
+# 전체 상권 x 기간 x 시간대 예측 (model.predict는 한 번만 호출)
+def batch_predict(quarter_df, periods, model_entry, districts=None):
+    base = latest_rows(quarter_df)
+    if districts is not None:
+        base = base[base['상권_코드_명'].isin(districts)]
+    batch = build_batch(base, periods)
+
+    X = model_entry.preprocessor.transform_sparse(batch)
+
+    result = batch[ID_COLUMNS + ['기준_년', '기준_분기', '시간대', '유사_업종_점포_수']].copy()
+    result['추정_매출'] = model_entry.predict_sales(X)
+    result['점포당_추정_매출'] = result['추정_매출'] / result['유사_업종_점포_수']
+    return result, X
+
+# 모델 입력 형식 (Predicted + 모델 피처 컬럼 순서의 인코딩된 입력값, CSV로 쓰기 위해 dense로 변환)
+# data/predictions.csv와는 컬럼이 다름: 기준_년은 원-핫이 아닌 숫자 하나, 시간대 원-핫 이름은 시간대_00_06 형식,
+# 예측 기간의 실제 값이 없는 시간대별_점포당_매출액은 없음
+def to_feature_format(result, X, feature_names):
+    predictions = pd.DataFrame(X.toarray(), columns=feature_names)
+    predictions.insert(0, 'Predicted', result['추정_매출'].to_numpy())
+    return predictions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="전체 상권 x 분기 매출 일괄 예측")
+    parser.add_argument('--start-year', type=int, default=START_YEAR)
+    parser.add_argument('--end-year', type=int, default=END_YEAR)
+    parser.add_argument('--district', action='append', help="예측할 상권명 (여러 번 지정 가능, 기본: 전체)")
+    parser.add_argument('--format', choices=['features', 'summary'], default='features',
+                        help="features: Predicted + 모델 입력 컬럼, summary: 상권/분기/시간대별 추정 매출")
+    parser.add_argument('--output', default='./data/batch_predictions.csv')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    quarter_df = data_loader.get_quarter_data()
+    model_entry = model_registry.registry.get()
+
+    result, X = batch_predict(quarter_df, make_periods(args.start_year, args.end_year), model_entry, args.district)
+
+    if args.format == 'features':
+        output = to_feature_format(result, X, model_entry.feature_names)
+    else:
+        output = result
+    output.to_csv(args.output, index=False, encoding='utf-8-sig')
+
+    print(f"{result['상권_코드_명'].nunique()}개 상권, {len(result):,}행 예측 -> {args.output} ({time.perf_counter() - start:.2f}초)")
@@ -0,0 +1,307 @@
+# -*- coding:utf-8 -*-
+import os
+import json
+import argparse
+import tempfile
+import subprocess
+import timeit
+import numpy as np
+import pandas as pd
+import data_loader
+import features
+import batch_predict
+import model_registry
+import maps
+import charts
+import areas
+import sensitivity
+import rankings
+import trees
+
+# 기본 데이터 배율 (원본, 10배, 100배)
+SCALES = [1, 10, 100]
+REPEAT = 3
+
+# 페이지에서 조회하는 분기와 상권
+YEAR, QUARTER = 2023, 3
+DISTRICT = '논현초등학교'
+
+
+# 원본 데이터를 factor배로 늘린 DataFrame
+# 복사본마다 상권명에 번호를 붙여 상권 수도 함께 늘어나게 함 (첫 번째 복사본은 원래 이름)
+def scale_frame(df, factor):
+    if factor == 1:
+        return df
+    categorical = isinstance(df['상권_코드_명'].dtype, pd.CategoricalDtype)
+    copies = [df]
+    for i in range(1, factor):
+        copy = df.copy()
+        names = copy['상권_코드_명'].astype(str) + f'_{i}'
+        copy['상권_코드_명'] = names.astype('category') if categorical else names
+        copies.append(copy)
+    return data_loader.concat_frames(copies) if categorical else pd.concat(copies, ignore_index=True)
+
+
+# 배율별 벤치마크 입력 (늘린 데이터와 파일은 처음 사용할 때 한 번만 만듦)
+class Context:
+    def __init__(self, scale, directory):
+        self.scale = scale
+        self.directory = directory
+        self._values = {}
+
+    def cached(self, key, builder):
+        if key not in self._values:
+            self._values[key] = builder()
+        return self._values[key]
+
+    # 원본 CSV (파생 컬럼 계산 전)
+    def raw(self, name):
+        csv_path, _ = data_loader.DATASETS[name]
+        return self.cached(('raw', name), lambda: scale_frame(pd.read_csv(csv_path), self.scale))
+
+    # 파생 컬럼까지 계산된 데이터
+    def frame(self, name):
+        return self.cached(('frame', name), lambda: scale_frame(data_loader.get_dataset(name), self.scale))
+
+    def csv_path(self, name):
+        def build():
+            path = os.path.join(self.directory, f'{name}_{self.scale}.csv')
+            self.raw(name).to_csv(path, index=False)
+            return path
+        return self.cached(('csv', name), build)
+
+    def parquet_path(self, name):
+        def build():
+            path = os.path.join(self.directory, f'{name}_{self.scale}.parquet')
+            self.frame(name).to_parquet(path, index=False, compression='zstd')
+            return path
+        return self.cached(('parquet', name), build)
+
+    def index(self, name):
+        return self.cached(('index', name), lambda: data_loader.DistrictIndex(self.frame(name)))
+
+    def rankings(self):
+        return self.cached('rankings', lambda: rankings.RankingTable(self.frame('streamlit_df')[rankings.RANKING_COLUMNS]))
+
+    def model_entry(self):
+        return self.cached('model', model_registry.registry.get)
+
+    # 매출 예측 페이지의 입력 (한 상권의 시간대별 6행)
+    def user_data(self):
+        def build():
+            quarter_df = data_loader.get_dataset('quarter_df')
+            base = batch_predict.latest_rows(quarter_df)
+            return batch_predict.build_batch(base[base['상권_코드_명'] == DISTRICT], [(YEAR, QUARTER)])
+        return self.cached('user_data', build)
+
+    # 전체 행의 모델 입력 데이터
+    def batch_data(self):
+        return self.cached('batch_data', lambda: features.add_density(self.frame('quarter_df').copy()))
+
+    def batch_matrix(self):
+        return self.cached('batch_matrix', lambda: self.model_entry().preprocessor.transform(self.batch_data()))
+
+    def batch_sparse(self):
+        return self.cached('batch_sparse', lambda: self.model_entry().preprocessor.transform_sparse(self.batch_data()))
+
+
+# 벤치마크 목록: 이름 -> (Context를 받아 (측정할 함수, 처리 행 수)를 반환하는 함수)
+BENCHMARKS = {}
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+# 데이터 로드
+@benchmark('load.streamlit_csv')
+def bench_streamlit_csv(ctx):
+    path = ctx.csv_path('streamlit_df')
+    return lambda: data_loader.read_streamlit_data(path), len(ctx.raw('streamlit_df'))
+
+@benchmark('load.quarter_csv')
+def bench_quarter_csv(ctx):
+    path = ctx.csv_path('quarter_df')
+    return lambda: data_loader.read_quarter_data(path), len(ctx.raw('quarter_df'))
+
+@benchmark('load.streamlit_parquet')
+def bench_streamlit_parquet(ctx):
+    import app
+    path = ctx.parquet_path('streamlit_df')
+    return lambda: pd.read_parquet(path, columns=app.ANALYSIS_COLUMNS), len(ctx.frame('streamlit_df'))
+
+@benchmark('load.quarter_parquet')
+def bench_quarter_parquet(ctx):
+    import app
+    path = ctx.parquet_path('quarter_df')
+    return lambda: pd.read_parquet(path, columns=app.PREDICT_COLUMNS), len(ctx.frame('quarter_df'))
+
+@benchmark('load.cached')
+def bench_cached(ctx):
+    path = ctx.parquet_path('quarter_df')
+    cache = data_loader.DatasetCache()
+    loader = lambda: pd.read_parquet(path)
+    cache.get('quarter_df', [path], loader)
+    return lambda: cache.get('quarter_df', [path], loader), len(ctx.frame('quarter_df'))
+
+# 페이지 필터링 (기존 boolean mask와 인덱스 조회)
+@benchmark('filter.mask')
+def bench_filter_mask(ctx):
+    df = ctx.frame('streamlit_df')
+
+    def run():
+        quarter_df = df[(df['기준_년'] == YEAR) & (df['기준_분기'] == QUARTER)]
+        return quarter_df[quarter_df['상권_코드_명'] == DISTRICT], df[df['상권_코드_명'] == DISTRICT]
+    return run, len(df)
+
+@benchmark('filter.index_build')
+def bench_index_build(ctx):
+    df = ctx.frame('streamlit_df')
+    return lambda: data_loader.DistrictIndex(df), len(df)
+
+@benchmark('filter.index_get')
+def bench_index_get(ctx):
+    index = ctx.index('streamlit_df')
+    return lambda: (index.get(YEAR, QUARTER, DISTRICT), index.quarter(YEAR, QUARTER), index.district(DISTRICT)), len(index.df)
+
+# 강남구 상권 분석 순위표 (기존의 분기 데이터 정렬, 전체 순위표 계산, 미리 계산한 순위표 조회)
+@benchmark('filter.leaderboard_sort')
+def bench_leaderboard_sort(ctx):
+    df = ctx.index('streamlit_df').quarter(YEAR, QUARTER)
+    return lambda: df.sort_values(rankings.RANK_METRICS['매출'], ascending=False), len(df)
+
+@benchmark('filter.rankings_build')
+def bench_rankings_build(ctx):
+    df = ctx.frame('streamlit_df')[rankings.RANKING_COLUMNS]
+    return lambda: rankings.RankingTable(df), len(df)
+
+@benchmark('filter.leaderboard')
+def bench_leaderboard(ctx):
+    table = ctx.rankings()
+    return lambda: (table.board(YEAR, QUARTER, '매출'), table.get(YEAR, QUARTER, DISTRICT)), len(table.board(YEAR, QUARTER, '매출'))
+
+# 모델 입력 생성
+@benchmark('features.single')
+def bench_features_single(ctx):
+    preprocessor, user_data = ctx.model_entry().preprocessor, ctx.user_data()
+    return lambda: preprocessor.transform(user_data), len(user_data)
+
+@benchmark('features.batch')
+def bench_features_batch(ctx):
+    preprocessor, data = ctx.model_entry().preprocessor, ctx.batch_data()
+    return lambda: preprocessor.transform(data), len(data)
+
+@benchmark('features.batch_sparse')
+def bench_features_batch_sparse(ctx):
+    preprocessor, data = ctx.model_entry().preprocessor, ctx.batch_data()
+    return lambda: preprocessor.transform_sparse(data), len(data)
+
+# 예측
+@benchmark('predict.single')
+def bench_predict_single(ctx):
+    model_entry = ctx.model_entry()
+    X = model_entry.preprocessor.transform(ctx.user_data())
+    return lambda: model_entry.predict_sales(X), len(X)
+
+@benchmark('predict.batch')
+def bench_predict_batch(ctx):
+    model_entry, X = ctx.model_entry(), ctx.batch_matrix()
+    return lambda: model_entry.predict_sales(X), len(X)
+
+@benchmark('predict.batch_sparse')
+def bench_predict_batch_sparse(ctx):
+    model_entry, X = ctx.model_entry(), ctx.batch_sparse()
+    return lambda: model_entry.predict_sales(X), X.shape[0]
+
+# 추정 매출 + 분위수별 추정 매출 (예측 구간)
+@benchmark('predict.range_single')
+def bench_predict_range_single(ctx):
+    model_entry = ctx.model_entry()
+    X = model_entry.preprocessor.transform_sparse(ctx.user_data())
+    return lambda: model_entry.predict_range(X), X.shape[0]
+
+@benchmark('predict.range_batch')
+def bench_predict_range_batch(ctx):
+    model_entry, X = ctx.model_entry(), ctx.batch_sparse()
+    return lambda: model_entry.predict_range(X), X.shape[0]
+
+# NumPy 노드 표로 전체 행 예측 (원시 점수)
+@benchmark('predict.flat_batch')
+def bench_predict_flat_batch(ctx):
+    model_entry, X = ctx.model_entry(), ctx.batch_matrix()
+    forest = trees.load_forest(model_registry.MODEL_PATH, model_entry.booster)
+    return lambda: forest.predict(X), len(X)
+
+# 민감도 분석 (항목 두 개 x HEATMAP_POINTS개 격자를 한 번에 예측)
+@benchmark('predict.sweep')
+def bench_predict_sweep(ctx):
+    model_entry, user_data = ctx.model_entry(), ctx.user_data()
+    sweeps = [(name, np.linspace(1, 1000, sensitivity.HEATMAP_POINTS)) for name in ['17~21 유동인구', '편의점 점포 수']]
+    return lambda: sensitivity.sweep_predict(model_entry, user_data, sweeps), sensitivity.HEATMAP_POINTS ** 2 * len(user_data)
+
+# 여러 상권 비교 테이블 (최대 선택 수만큼의 상권, 처리 행 수 = 상권 수)
+@benchmark('charts.compare')
+def bench_charts_compare(ctx):
+    import app
+    streamlit_index, quarter_index = ctx.index('streamlit_df'), ctx.index('quarter_df')
+    districts = streamlit_index.districts()[:app.MAX_COMPARE]
+    return lambda: charts.DistrictComparison(streamlit_index, quarter_index, districts, YEAR, QUARTER), len(districts)
+
+# 지도 생성
+@benchmark('map.circles')
+def bench_map_circles(ctx):
+    df = ctx.index('streamlit_df').quarter(YEAR, QUARTER)
+    return lambda: maps.render_map(df, '유동인구'), len(df)
+
+@benchmark('map.choropleth')
+def bench_map_choropleth(ctx):
+    df = ctx.index('streamlit_df').quarter(YEAR, QUARTER)
+    boundaries = areas.get_boundaries(maps.MAP_ZOOM)
+    return lambda: maps.render_map(df, '매출', boundaries), len(df)
+
+
+# 한 번 실행에 0.2초 이상 걸리도록 반복 횟수를 정한 뒤 repeat번 측정 (1회당 초)
+def measure(fn, repeat=REPEAT):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return np.array(timer.repeat(repeat=repeat, number=number)) / number
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(names, scales=SCALES, repeat=REPEAT):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in scales:
+            ctx = Context(scale, directory)
+            for name in names:
+                fn, rows = BENCHMARKS[name](ctx)
+                seconds = measure(fn, repeat)
+                result = {'name': name, 'scale': scale, 'rows': rows,
+                          'median_ms': float(np.median(seconds) * 1000), 'min_ms': float(seconds.min() * 1000),
+                          'rows_per_second': float(rows / np.median(seconds))}
+                results.append(result)
+                print(f"{name:<24} x{scale:<4} {rows:>9,}행  {result['median_ms']:>10.3f}ms (최소 {result['min_ms']:.3f}ms)  "
+                      f"{result['rows_per_second']:>14,.0f}행/초", flush=True)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="데이터 로드/필터링/피처 생성/예측/지도 생성 벤치마크")
+    parser.add_argument('--scale', type=int, action='append', help=f"데이터 배율 (여러 번 지정 가능, 기본: {SCALES})")
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--only', action='append', help="이름이 이 값으로 시작하는 벤치마크만 실행 (예: predict, load.quarter)")
+    parser.add_argument('--output', help="결과를 저장할 JSON 경로 (커밋별 비교용)")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if not args.only or any(name.startswith(prefix) for prefix in args.only)]
+    results = run_benchmarks(names, args.scale or SCALES, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'commit': git_commit(), 'results': results}, f, ensure_ascii=False, indent=1)
+        print(f"결과 저장 -> {args.output}")
@@ -0,0 +1,254 @@
+# -*- coding:utf-8 -*-
+import threading
+import pandas as pd
+import plotly.express as px
+from cachetools import LRUCache
+from data_loader import WEEKDAYS
+
+# 상권 x 분기 키
+KEY = ['기준_년', '기준_분기', '상권_코드_명']
+
+# 연령대 컬럼 -> 표시 이름
+AGE_LABELS = {'10': '10대', '20': '20대', '30': '30대', '40': '40대', '50': '50대', '60_이상': '60대 이상'}
+
+def age_columns(kind):
+    return {f'연령대_{age}_{kind}': label for age, label in AGE_LABELS.items()}
+
+# 요일/성별/연령대별 long-format 테이블 정의: 이름 -> (원본 컬럼 -> 표시 이름, 변수명, 값 이름)
+BREAKDOWNS = {
+    'week_sales': ({f'점포당_{day}_매출액': day for day in WEEKDAYS}, '요일', '매출_금액'),
+    'gender_sales': ({'점포당_남성_매출_금액': '점포당_남성_매출_금액', '점포당_여성_매출_금액': '점포당_여성_매출_금액'}, '성별', '매출_금액'),
+    'age_sales': (age_columns('매출_금액'), '연령대', '매출_금액'),
+    'week_floating': ({f'{day}_유동인구_수': day for day in WEEKDAYS}, '요일', '유동인구 수'),
+    'gender_floating': ({'남성_유동인구_수': '남성_유동인구_수', '여성_유동인구_수': '여성_유동인구_수'}, '성별', '유동인구 수'),
+    'age_floating': (age_columns('유동인구_수'), '연령대', '유동인구 수'),
+    'gender_resident': ({'남성_상주인구_수': '남성_상주인구_수', '여성_상주인구_수': '여성_상주인구_수'}, '성별', '상주인구 수'),
+    'age_resident': (age_columns('상주인구_수'), '연령대', '상주인구 수'),
+}
+
+
+# 전체 상권 x 분기의 long-format 테이블
+# 상권마다 rename + melt를 하는 대신 테이블별로 전체 데이터를 한 번만 melt 해 두고 (상권, 분기)별 행 위치로 조회
+class ChartTables:
+    def __init__(self, streamlit_df):
+        self._tables = {}
+        for name, (columns, var_name, value_name) in BREAKDOWNS.items():
+            long = streamlit_df[KEY + list(columns)].rename(columns=columns) \
+                .melt(id_vars=KEY, var_name=var_name, value_name=value_name)
+            positions = {
+                (int(year), int(quarter), district): rows
+                for (year, quarter, district), rows in long.groupby(KEY, observed=True, sort=False).indices.items()
+            }
+            self._tables[name] = (long[['상권_코드_명', var_name, value_name]], positions)
+
+    def get(self, name, year, quarter, district):
+        long, positions = self._tables[name]
+        return long.iloc[positions[(year, quarter, district)]]
+
+
+# 여러 상권 비교에서 겹쳐 그리는 값: 컬럼 -> 표시 이름
+COMPARE_SERIES = {'점포당_매출액': '매출액', '총_유동인구_수': '총 유동인구 수', '유사_업종_점포_수': '점포수'}
+COMPARE_SLOTS = {'시간대별_점포당_매출액': '매출액', '시간대_유동인구_수': '유동인구 수'}
+
+# 비교 차트: 이름 -> (테이블, 컬럼 또는 BREAKDOWNS 이름, 차트 종류, 제목)
+COMPARE_FIGURES = {
+    'quarterly_sales': ('series', '점포당_매출액', 'line', '분기별 매출 추이'),
+    'time_sales': ('slots', '시간대별_점포당_매출액', 'bar', '시간대별 매출'),
+    'week_sales': ('breakdown', 'week_sales', 'bar', '요일별 매출'),
+    'gender_sales': ('breakdown', 'gender_sales', 'share', '성별 매출 비율'),
+    'age_sales': ('breakdown', 'age_sales', 'bar', '연령대별 매출 금액'),
+    'quarterly_population': ('series', '총_유동인구_수', 'line', '분기별 유동인구 수 추이'),
+    'time_population': ('slots', '시간대_유동인구_수', 'bar', '시간대별 유동인구 수'),
+    'week_floating': ('breakdown', 'week_floating', 'bar', '요일별 유동인구 수'),
+    'gender_floating': ('breakdown', 'gender_floating', 'share', '성별 유동인구 비율'),
+    'age_floating': ('breakdown', 'age_floating', 'bar', '연령대별 유동인구 수'),
+    'gender_resident': ('breakdown', 'gender_resident', 'share', '성별 상주인구 비율'),
+    'age_resident': ('breakdown', 'age_resident', 'bar', '연령대별 상주인구 수'),
+    'store': ('series', '유사_업종_점포_수', 'line', '점포수'),
+}
+
+
+# 가로축 글자 방향 고정
+def fix_xaxis(fig):
+    fig.update_layout(xaxis=dict(tickangle=0), autosize=True)
+    return fig
+
+# 범례를 왼쪽 위로 옮기기
+def move_legend(fig):
+    fig.update_layout(legend=dict(x=0, y=1.1))
+    return fig
+
+
+# 여러 상권 비교 테이블 (선택한 상권이 컬럼인 wide-format)
+# - 선택한 상권의 행만 인덱스로 모은 뒤 분기별 추이와 시간대별 값을 각각 한 번의 pivot으로 펼침
+# - 요일/성별/연령대 구성은 선택한 분기의 상권별 행을 (항목 x 상권)으로 뒤집기만 함
+# - 계산량은 전체 상권 수가 아니라 선택한 상권 수에 비례 (상권마다 페이지를 따로 그리지 않음)
+class DistrictComparison:
+    def __init__(self, streamlit_index, quarter_index, districts, year, quarter):
+        self.districts = list(dict.fromkeys(districts))
+        self.year, self.quarter = year, quarter
+        rows = pd.concat([streamlit_index.district(name) for name in self.districts])
+        slots = pd.concat([quarter_index.get(year, quarter, name) for name in self.districts])
+
+        # 분기별 추이: (기준_년, 기준_분기, 기준_년분기) x (컬럼, 상권)
+        self.series = rows.pivot_table(index=['기준_년', '기준_분기', '기준_년분기'], columns='상권_코드_명',
+                                       values=list(COMPARE_SERIES), observed=True)
+        # 시간대별 값: 시간대 x (컬럼, 상권)
+        self.slots = slots.pivot_table(index='시간대', columns='상권_코드_명', values=list(COMPARE_SLOTS), observed=True)
+        # 선택한 분기의 상권별 행
+        self.current = rows[(rows['기준_년'] == year) & (rows['기준_분기'] == quarter)].set_index('상권_코드_명')
+
+    # pivot 결과에서 한 컬럼의 (행 x 상권) 표 (선택한 순서, 데이터가 없는 상권은 제외)
+    def wide(self, table):
+        table = table.set_axis(table.columns.astype(str), axis=1)
+        return table[[name for name in self.districts if name in table.columns]]
+
+    # 선택한 분기의 지표와 직전 분기 대비 증감 (상권 x (지표, 증감))
+    def summary(self):
+        series = self.series.droplevel('기준_년분기')
+        if (self.year, self.quarter) not in series.index:
+            return pd.DataFrame(index=pd.Index([], name='상권_코드_명'))
+        position = series.index.get_loc((self.year, self.quarter))
+        current = series.iloc[position]
+        delta = current - series.iloc[position - 1] if position > 0 else current * float('nan')
+        table = pd.DataFrame({'값': current, '증감': delta}).unstack(level=0).swaplevel(axis=1)
+        table.index = table.index.astype(str)
+        return table[[(column, kind) for column in COMPARE_SERIES for kind in ['값', '증감']]] \
+            .rename(columns=COMPARE_SERIES, level=0).reindex([name for name in self.districts if name in table.index])
+
+    def figure(self, name):
+        table, key, kind, title = COMPARE_FIGURES[name]
+        if table == 'series':
+            wide = self.wide(self.series[key].droplevel(['기준_년', '기준_분기']))
+            label = COMPARE_SERIES[key]
+        elif table == 'slots':
+            wide = self.wide(self.slots[key])
+            label = COMPARE_SLOTS[key]
+        else:
+            columns, var_name, label = BREAKDOWNS[key]
+            wide = self.wide(self.current[list(columns)].rename(columns=columns).T.rename_axis(index=var_name))
+
+        if kind == 'line':
+            fig = px.line(wide, markers=True, title=title, width=1000)
+        elif kind == 'share':
+            fig = px.bar(wide / wide.sum(), barmode='group', title=title, width=500)
+            fig.update_yaxes(tickformat='.0%')
+            label = '비율'
+        else:
+            fig = px.bar(wide, barmode='group', title=title, width=1000 if table == 'series' else 500)
+        fig.update_yaxes(title_text=label)
+        fig.update_layout(legend_title_text='상권')
+        return fix_xaxis(fig)
+
+
+# 상권별 분석 페이지의 차트 모음
+# - long-format 테이블은 생성할 때 전체 상권에 대해 미리 계산
+# - plotly 차트는 처음 요청될 때 만들고 (차트, 상권, 분기)별로 캐시 (모든 세션에서 공유)
+class DistrictCharts:
+    def __init__(self, streamlit_index, quarter_index, maxsize=2048):
+        self.streamlit_index = streamlit_index
+        self.quarter_index = quarter_index
+        self.tables = ChartTables(streamlit_index.df)
+        self._lock = threading.Lock()
+        self._figures = LRUCache(maxsize=maxsize)
+
+    def _cached(self, key, builder):
+        with self._lock:
+            value = self._figures.get(key)
+        if value is None:
+            value = builder()
+            with self._lock:
+                self._figures[key] = value
+        return value
+
+    def figure(self, name, district, year, quarter):
+        return self._cached((name, district, year, quarter), lambda: getattr(self, f'_{name}')(district, year, quarter))
+
+    # 여러 상권 비교 (비교 테이블과 차트 모두 (상권 목록, 분기)별로 캐시)
+    def comparison(self, districts, year, quarter):
+        return self._cached(('comparison', tuple(districts), year, quarter),
+                            lambda: DistrictComparison(self.streamlit_index, self.quarter_index, districts, year, quarter))
+
+    def compare_figure(self, name, districts, year, quarter):
+        return self._cached(('compare', name, tuple(districts), year, quarter),
+                            lambda: self.comparison(districts, year, quarter).figure(name))
+
+    # 매출
+    def _quarterly_sales(self, district, year, quarter):
+        fig = px.line(self.streamlit_index.district(district), x='기준_년분기', y='점포당_매출액')
+        fig.update_layout(xaxis=dict(tickangle=0), autosize=True, width=1000)
+        fig.update_yaxes(title="매출액")
+        return fig
+
+    def _time_sales(self, district, year, quarter):
+        fig = px.bar(self.quarter_index.get(year, quarter, district), x='시간대', y='시간대별_점포당_매출액', title='시간대별 매출', width=500)
+        fix_xaxis(fig).update_yaxes(title_text='매출액')
+        return fig
+
+    def _week_sales(self, district, year, quarter):
+        fig = px.bar(self.tables.get('week_sales', year, quarter, district), x='요일', y='매출_금액', title='요일별 매출', width=500)
+        fix_xaxis(fig).update_yaxes(title_text='매출액')
+        return fig
+
+    def _gender_sales(self, district, year, quarter):
+        return move_legend(px.pie(self.tables.get('gender_sales', year, quarter, district),
+                                  values='매출_금액', names='성별', title='성별 매출 비율', width=500))
+
+    def _age_sales(self, district, year, quarter):
+        fig = px.bar(self.tables.get('age_sales', year, quarter, district), x='연령대', y='매출_금액', title='연령대별 매출 금액', width=500)
+        fig.update_yaxes(title_text='매출액')
+        return fig
+
+    # 유동인구
+    def _quarterly_population(self, district, year, quarter):
+        fig = px.line(self.streamlit_index.district(district), x='기준_년분기', y='총_유동인구_수')
+        fig.update_layout(xaxis=dict(tickangle=0), autosize=True, width=1000)
+        fig.update_yaxes(title_text='총 유동인구 수')
+        return fig
+
+    def _time_population(self, district, year, quarter):
+        fig = px.bar(self.quarter_index.get(year, quarter, district), x='시간대', y='시간대_유동인구_수', title='시간대별 유동인구 수', width=500)
+        fix_xaxis(fig).update_yaxes(title_text='유동인구 수')
+        return fig
+
+    def _week_floating(self, district, year, quarter):
+        return fix_xaxis(px.bar(self.tables.get('week_floating', year, quarter, district),
+                                x='요일', y='유동인구 수', title='요일별 유동인구 수', width=500))
+
+    def _gender_floating(self, district, year, quarter):
+        return move_legend(px.pie(self.tables.get('gender_floating', year, quarter, district),
+                                  values='유동인구 수', names='성별', title='성별 유동인구 비율', width=500))
+
+    def _age_floating(self, district, year, quarter):
+        return px.bar(self.tables.get('age_floating', year, quarter, district), x='연령대', y='유동인구 수', title='연령대별 유동인구 수', width=500)
+
+    # 상주인구
+    def _gender_resident(self, district, year, quarter):
+        return move_legend(px.pie(self.tables.get('gender_resident', year, quarter, district),
+                                  values='상주인구 수', names='성별', title='성별 상주인구 비율', width=500))
+
+    def _age_resident(self, district, year, quarter):
+        return px.bar(self.tables.get('age_resident', year, quarter, district), x='연령대', y='상주인구 수', title='연령대별 상주인구 수', width=500)
+
+    # 점포수 (점포수 추이 + 개·폐업수)
+    def _store(self, district, year, quarter):
+        selected = self.streamlit_index.district(district)
+        store = px.line(selected, x='기준_년분기', y='유사_업종_점포_수', title='점포수', width=1000)
+        store.update_layout(yaxis=dict(range=[0, selected['유사_업종_점포_수'].max() + 10]), autosize=True)
+
+        store_openclose = px.bar(selected, x='기준_년분기', y=['개업_점포_수', '폐업_점포_수'], barmode='group', title='개·폐업수', width=1000)
+        for data in store_openclose.data:
+            store.add_trace(data)
+        return store
+
+
+# 데이터가 다시 로드되어 인덱스가 바뀌었을 때만 새로 만드는 차트 모음
+_charts_lock = threading.Lock()
+_charts = None
+
+def get_district_charts(streamlit_index, quarter_index):
+    global _charts
+    with _charts_lock:
+        if _charts is None or _charts.streamlit_index is not streamlit_index or _charts.quarter_index is not quarter_index:
+            _charts = DistrictCharts(streamlit_index, quarter_index)
+        return _charts
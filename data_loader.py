@@ -0,0 +1,439 @@
+# -*- coding:utf-8 -*-
+import os
+import argparse
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from instrumentation import instrumentation
+
+# 데이터 파일 경로
+STREAMLIT_DF_PATH = "./data/streamlit_df.csv"
+QUARTER_DF_PATH = "./data/final_merged_update_store_age_df.csv"
+AREA_SHP_PATH = "./data/서울시 상권분석서비스(영역-상권).shp"
+
+# 상권 영역 좌표계 (shapefile 원본, 미터 단위)
+AREA_CRS = "EPSG:5181"
+
+# 상권 영역 shapefile 컬럼명 (data_exploration 노트북과 같은 이름)
+AREA_COLUMNS = {
+    'TRDAR_SE_C': '상권_구분_코드',
+    'TRDAR_SE_1': '상권_구분_코드_명',
+    'TRDAR_CD': '상권_코드',
+    'TRDAR_CD_N': '상권_코드_명',
+    'XCNTS_VALU': '엑스좌표_값',
+    'YDNTS_VALU': '와이좌표_값',
+    'SIGNGU_CD': '자치구_코드',
+    'SIGNGU_CD_': '자치구_코드_명',
+    'ADSTRD_CD': '행정동_코드',
+    'ADSTRD_CD_': '행정동_코드_명',
+    'RELM_AR': '영역_면적'
+}
+
+# 요일 목록
+WEEKDAYS = ['월요일', '화요일', '수요일', '목요일', '금요일', '토요일', '일요일']
+
+# 컬럼 타입 규칙 (CSV 기본 타입인 object/float64 대신 적용)
+# - 반복되는 이름 컬럼: category
+# - 코드, 인구/점포/시설/가구 수, 건수: int32 (결측이 있으면 float32)
+# - 금액, 비율, 좌표, 평균: float64 그대로 (금액은 int32 범위를 넘고, 비율/좌표는 모델 입력/위치 값이 바뀌지 않도록)
+CATEGORY_COLUMNS = ['상권_코드_명', '행정동_코드_명', '상권_구분_코드_명', '자치구_코드_명', '시간대', '기준_년분기']
+INTEGER_COLUMNS = ['기준_년', '기준_분기', '상권_코드', '자치구_코드', '행정동_코드']
+INTEGER_SUFFIXES = ('_수', '_건수')
+
+# 앱에서 사용하지 않는 컬럼 (WKT 문자열)
+UNUSED_COLUMNS = ['geometry']
+
+# 컬럼 이름 -> 저장 타입 (규칙에 없으면 None)
+def column_dtype(col):
+    if col in CATEGORY_COLUMNS:
+        return 'category'
+    if col in INTEGER_COLUMNS or col.endswith(INTEGER_SUFFIXES):
+        return 'int32'
+    return None
+
+# 타입 규칙 적용 (파생 컬럼까지 계산한 뒤 호출)
+# 정수 컬럼에 소수나 범위를 넘는 값이 있으면 값이 바뀌지 않도록 ValueError
+def compact_dtypes(df):
+    for col in df.columns:
+        dtype = column_dtype(col)
+        if dtype == 'category':
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+        elif dtype == 'int32' and df[col].dtype != np.int32:
+            values = df[col].to_numpy(dtype=np.float64)
+            finite = values[~np.isnan(values)]
+            if (finite != np.round(finite)).any() or (np.abs(finite) > np.iinfo(np.int32).max).any():
+                raise ValueError(f"{col}: int32로 저장할 수 없는 값이 있습니다.")
+            if len(finite) < len(values):
+                # float32는 2^24까지의 정수를 그대로 표현
+                if (np.abs(finite) > 2 ** 24).any():
+                    raise ValueError(f"{col}: 결측이 있는 float32 컬럼의 범위를 넘는 값이 있습니다.")
+                df[col] = values.astype(np.float32)
+            else:
+                df[col] = values.astype(np.int32)
+    # 컬럼별로 타입을 바꾸면 내부 블록이 컬럼 수만큼 나뉘어 행 조회(iloc)가 느려지므로 한 번 합침
+    return df.copy()
+
+# streamlit_df 파생 컬럼 계산 함수
+def add_streamlit_columns(streamlit_df):
+    streamlit_df['점포당_매출액'] = (streamlit_df['당월_매출_금액'] / streamlit_df['유사_업종_점포_수']).round()
+    streamlit_df['기준_년분기'] = streamlit_df['기준_년'].astype(str) + '년' + streamlit_df['기준_분기'].astype(str) + '분기'
+    streamlit_df['점포당_남성_매출_금액'] = streamlit_df['남성_매출_금액'] / streamlit_df['유사_업종_점포_수'].round()
+    streamlit_df['점포당_여성_매출_금액'] = streamlit_df['여성_매출_금액'] / streamlit_df['유사_업종_점포_수'].round()
+
+    # 요일별 매출액 계산
+    for day in WEEKDAYS:
+        col_name = f'점포당_{day}_매출액'
+        streamlit_df[col_name] = streamlit_df[f'{day}_매출_금액'] / streamlit_df['유사_업종_점포_수'].round()
+    return streamlit_df
+
+# quarter_df 파생 컬럼 계산 함수
+def add_quarter_columns(quarter_df):
+    quarter_df['시간대별_점포당_매출액'] = (quarter_df['시간대_매출금액'] / quarter_df['유사_업종_점포_수']).round()
+    return quarter_df
+
+# CSV를 읽는 함수 (사용하지 않는 컬럼 제외, 이름 컬럼은 읽을 때부터 category)
+# compact=False면 pandas 기본 타입으로 전체 컬럼을 읽음 (메모리 비교용)
+def read_csv(path, compact=True):
+    if not compact:
+        return pd.read_csv(path)
+    return pd.read_csv(path,
+                       usecols=lambda col: col not in UNUSED_COLUMNS,
+                       dtype={col: 'category' for col in CATEGORY_COLUMNS})
+
+# CSV를 읽고 파생 컬럼까지 계산한 뒤 타입 규칙을 적용하는 함수
+def read_streamlit_data(path=STREAMLIT_DF_PATH, compact=True):
+    df = add_streamlit_columns(read_csv(path, compact))
+    return compact_dtypes(df) if compact else df
+
+def read_quarter_data(path=QUARTER_DF_PATH, compact=True):
+    df = add_quarter_columns(read_csv(path, compact))
+    return compact_dtypes(df) if compact else df
+
+# 상권 영역 shapefile을 읽는 함수 (geometry는 WKB로 저장해 parquet 스냅샷에 그대로 담음)
+def read_area_data(path=AREA_SHP_PATH):
+    # geopandas는 shapefile을 다시 읽을 때만 필요하므로 여기서 import
+    import geopandas as gpd
+    import shapely
+
+    areas = gpd.read_file(path).to_crs(AREA_CRS).rename(columns=AREA_COLUMNS)
+    area_df = pd.DataFrame(areas.drop(columns='geometry'))
+    area_df['geometry'] = shapely.to_wkb(areas.geometry.to_numpy())
+    return area_df
+
+# 컬럼별 메모리 사용량 비교 (pandas 기본 타입으로 읽은 전체 컬럼 vs 타입 규칙 적용 후)
+# 사용하지 않아 제외한 컬럼은 적용 후 값이 비어 있음
+def memory_report(name):
+    csv_path, reader = DATASETS[name]
+    default, compact = reader(csv_path, compact=False), reader(csv_path)
+    return pd.DataFrame({
+        '기본_타입': default.dtypes.astype(str),
+        '기본_bytes': default.memory_usage(deep=True, index=False),
+        '타입': compact.dtypes.astype(str),
+        'bytes': compact.memory_usage(deep=True, index=False),
+    })
+
+# 데이터셋 이름 -> (원본 파일 경로, 원본 로드 함수)
+DATASETS = {
+    'streamlit_df': (STREAMLIT_DF_PATH, read_streamlit_data),
+    'quarter_df': (QUARTER_DF_PATH, read_quarter_data),
+    'areas': (AREA_SHP_PATH, read_area_data),
+}
+
+# 파일 내용 해시 계산 함수
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# 원본 파일에 대응하는 parquet 스냅샷 경로
+def snapshot_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+# 파생 컬럼까지 계산된 데이터를 parquet 스냅샷으로 저장하는 함수
+# 원본 파일의 해시를 메타데이터로 남겨 두고 로드할 때 최신 여부를 확인
+def build_snapshot(name):
+    csv_path, reader = DATASETS[name]
+    path = snapshot_path(csv_path)
+
+    table = pa.Table.from_pandas(reader(csv_path), preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'source_sha1'] = file_hash(csv_path).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    # 쓰는 도중에 다른 프로세스가 읽지 않도록 임시 파일에 쓰고 교체
+    tmp_path = path + '.tmp'
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+    return path
+
+# 스냅샷이 원본 파일과 같은 내용으로 만들어졌는지 확인
+def snapshot_is_fresh(csv_path, path):
+    if not os.path.exists(path):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    metadata = pq.read_schema(path).metadata or {}
+    return metadata.get(b'source_sha1') == file_hash(csv_path).encode()
+
+# 분기 파티션 키
+PARTITION_KEY = ['기준_년', '기준_분기']
+
+# 새 분기 데이터를 추가하는 파티션 폴더 (원본 CSV/스냅샷은 그대로 두고 분기별 parquet 파일만 추가)
+def partition_dir(name):
+    csv_path, _ = DATASETS[name]
+    return os.path.splitext(csv_path)[0] + '_partitions'
+
+def partition_path(name, year, quarter):
+    return os.path.join(partition_dir(name), f'{year}_{quarter}.parquet')
+
+# 추가된 분기 파티션 파일 목록 ((기준_년, 기준_분기) 순)
+def partition_paths(name):
+    directory = partition_dir(name)
+    if not os.path.isdir(directory):
+        return []
+    keys = sorted(tuple(int(part) for part in os.path.splitext(filename)[0].split('_'))
+                  for filename in os.listdir(directory) if filename.endswith('.parquet'))
+    return [partition_path(name, year, quarter) for year, quarter in keys]
+
+# category 컬럼의 범주를 합쳐서 DataFrame 이어 붙이기 (범주가 다르면 pd.concat이 object로 바꾸므로)
+def concat_frames(frames):
+    frames = [df.copy() for df in frames]
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            categories = pd.api.types.union_categoricals([df[col] for df in frames]).categories
+            for df in frames:
+                df[col] = df[col].cat.set_categories(categories)
+    # 이어 붙인 결과의 나뉜 내부 블록을 합침 (compact_dtypes와 같은 이유)
+    return pd.concat(frames, ignore_index=True).copy()
+
+# 데이터셋을 읽는 함수 (스냅샷이 최신이면 필요한 컬럼만 parquet에서 읽고, 아니면 원본 파일)
+# 추가된 분기 파티션이 있으면 이어 붙임 (같은 분기가 원본에도 있으면 파티션이 우선)
+def read_dataset(name, columns=None):
+    csv_path, reader = DATASETS[name]
+    path = snapshot_path(csv_path)
+    partitions = partition_paths(name)
+
+    read_columns = columns
+    if partitions and columns is not None:
+        read_columns = list(columns) + [col for col in PARTITION_KEY if col not in columns]
+
+    if snapshot_is_fresh(csv_path, path):
+        df = pd.read_parquet(path, columns=read_columns)
+    else:
+        df = reader(csv_path)
+        df = df[read_columns] if read_columns is not None else df
+
+    if partitions:
+        added = [pd.read_parquet(partition, columns=read_columns) for partition in partitions]
+        replaced = pd.MultiIndex.from_frame(pd.concat([part[PARTITION_KEY] for part in added]).drop_duplicates())
+        keep = ~pd.MultiIndex.from_frame(df[PARTITION_KEY]).isin(replaced)
+        df = concat_frames([df[keep]] + added)
+        df = df[columns] if columns is not None else df
+    return df
+
+# 새 분기 데이터 추가
+# - source_path: 노트북 병합 결과와 같은 컬럼의 CSV (한 개 이상의 분기)
+# - 파생 컬럼은 추가하는 행에 대해서만 계산하고, 분기별 parquet 파일로 저장 (기존 분기 파일은 건드리지 않음)
+# - 같은 분기를 다시 추가하면 해당 분기 파일만 교체
+def ingest_partition(name, source_path):
+    csv_path, reader = DATASETS[name]
+    path = snapshot_path(csv_path)
+    if not os.path.exists(path):
+        raise ValueError(f"{name} 스냅샷({path})이 없습니다. 먼저 snapshot 명령으로 스냅샷을 만들어 주세요.")
+
+    # 기존 데이터는 읽지 않고 스냅샷의 스키마만 사용
+    schema = pq.read_schema(path).remove_metadata()
+    if not set(PARTITION_KEY) <= set(schema.names):
+        raise ValueError(f"{name}은(는) 분기별로 추가할 수 없는 데이터셋입니다.")
+
+    df = reader(source_path)
+    missing = [col for col in schema.names if col not in df.columns]
+    extra = [col for col in df.columns if col not in schema.names]
+    if missing or extra:
+        raise ValueError(f"{source_path}의 컬럼이 {name}과(와) 다릅니다. 없는 컬럼: {missing}, 불필요한 컬럼: {extra}")
+
+    source_sha1 = file_hash(source_path).encode()
+    os.makedirs(partition_dir(name), exist_ok=True)
+
+    paths = []
+    for (year, quarter), positions in df.groupby(PARTITION_KEY, sort=True).indices.items():
+        table = pa.Table.from_pandas(df.iloc[positions][schema.names], schema=schema, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'source_sha1': source_sha1})
+
+        # 쓰는 도중에 다른 프로세스가 읽지 않도록 임시 파일에 쓰고 교체
+        partition = partition_path(name, int(year), int(quarter))
+        tmp_path = partition + '.tmp'
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, partition)
+        paths.append(partition)
+    return paths
+
+
+# 프로세스 전체(모든 세션)에서 공유하는 데이터셋 캐시
+# - 파일들의 수정 시각/크기가 그대로면 캐시된 DataFrame을 바로 반환
+# - 수정 시각이 바뀌어도 내용 해시가 같으면 다시 읽지 않음
+# - 반환된 DataFrame은 모든 세션이 공유하므로 수정하지 말 것
+class DatasetCache:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}
+
+    def get(self, key, paths, loader):
+        version = tuple((os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in paths)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['version'] == version:
+                return entry['data']
+
+            # 수정 시각만 바뀐 경우 내용 해시로 다시 확인
+            digest = tuple(file_hash(path) for path in paths)
+            if entry is not None and entry['hash'] == digest:
+                entry['version'] = version
+                return entry['data']
+
+            data = loader()
+            memory = int(data.memory_usage(deep=True).sum()) if isinstance(data, pd.DataFrame) else 0
+            self._entries[key] = {'version': version, 'hash': digest, 'data': data, 'memory_bytes': memory}
+            return data
+
+    # 캐시된 DataFrame의 메모리 사용량 합계 (인덱스 등 다른 객체는 제외)
+    def memory_bytes(self):
+        with self._lock:
+            return sum(entry['memory_bytes'] for entry in self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+dataset_cache = DatasetCache()
+
+# 성능 모니터링 지표에 데이터셋 캐시 메모리 추가
+def dataset_cache_metrics():
+    return {'dataset_cache_bytes': ('gauge', dataset_cache.memory_bytes())}
+
+instrumentation.register_collector(dataset_cache_metrics)
+
+# 데이터셋의 버전을 결정하는 파일 목록 (원본 파일, 스냅샷, 추가된 분기 파티션)
+def dataset_paths(name):
+    csv_path, _ = DATASETS[name]
+    return [path for path in (csv_path, snapshot_path(csv_path)) if os.path.exists(path)] + partition_paths(name)
+
+# 캐시를 거쳐 데이터셋을 가져오는 함수 (columns를 주면 해당 컬럼만 읽음)
+def get_dataset(name, columns=None):
+    key = (name, tuple(columns) if columns is not None else None)
+    return dataset_cache.get(key, dataset_paths(name), lambda: read_dataset(name, columns))
+
+# 데이터셋으로 만든 객체(인덱스, 인코더 등)를 캐시를 거쳐 가져오는 함수 (데이터가 다시 로드되면 다시 만듦)
+def get_derived(name, key, builder, columns=None):
+    cache_key = (key, name, tuple(columns) if columns is not None else None)
+    return dataset_cache.get(cache_key, dataset_paths(name), lambda: builder(get_dataset(name, columns)))
+
+def get_streamlit_data(columns=None):
+    return get_dataset('streamlit_df', columns)
+
+def get_quarter_data(columns=None):
+    return get_dataset('quarter_df', columns)
+
+
+# (기준_년, 기준_분기, 상권_코드_명) 조회용 인덱스
+# 페이지마다 전체 테이블에 boolean mask를 거는 대신 groupby로 미리 구해 둔 행 위치를 dict에서 꺼내 iloc으로 자름
+# (키마다 DataFrame을 미리 만들지 않으므로 인덱스 생성은 groupby 비용만 듦)
+class DistrictIndex:
+    def __init__(self, df):
+        self.df = df
+        self._empty = df.iloc[0:0]
+
+        # 상권 x 분기별 행 위치
+        self._rows = {
+            (int(year), int(quarter), name): positions
+            for (year, quarter, name), positions
+            in df.groupby(['기준_년', '기준_분기', '상권_코드_명'], observed=True, sort=False).indices.items()
+        }
+        # 분기별 전체 상권 행 위치
+        self._quarters = {
+            (int(year), int(quarter)): positions
+            for (year, quarter), positions in df.groupby(['기준_년', '기준_분기'], sort=False).indices.items()
+        }
+        # 상권별 전체 기간 (시계열) 행 위치
+        self._districts = df.groupby('상권_코드_명', observed=True, sort=False).indices
+        # 행정동별 상권명 (등장 순서 유지)
+        self._dong_districts = {
+            dong: pd.unique(df['상권_코드_명'].iloc[positions])
+            for dong, positions in df.groupby('행정동_코드_명', observed=True, sort=False).indices.items()
+        }
+
+    def _slice(self, positions):
+        return self._empty if positions is None else self.df.iloc[positions]
+
+    # 특정 분기의 특정 상권 행
+    def get(self, year, quarter, name):
+        return self._slice(self._rows.get((year, quarter, name)))
+
+    # 특정 분기의 전체 상권
+    def quarter(self, year, quarter):
+        return self._slice(self._quarters.get((year, quarter)))
+
+    # 특정 상권의 전체 기간
+    def district(self, name):
+        return self._slice(self._districts.get(name))
+
+    # 행정동 목록과 행정동에 속한 상권명
+    def dongs(self):
+        return list(self._dong_districts)
+
+    # 전체 상권명 (등장 순서 유지)
+    def districts(self):
+        return list(self._districts)
+
+    def districts_in(self, dong):
+        return self._dong_districts.get(dong, [])
+
+# 캐시를 거쳐 데이터셋 인덱스를 가져오는 함수
+def get_dataset_index(name, columns=None):
+    return get_derived(name, 'index', DistrictIndex, columns)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="데이터 전처리 도구")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    snapshot_parser = subparsers.add_parser('snapshot', help="CSV/shapefile을 parquet 스냅샷으로 변환")
+    snapshot_parser.add_argument('names', nargs='*', default=list(DATASETS), help="변환할 데이터셋 (기본: 전체)")
+
+    ingest_parser = subparsers.add_parser('ingest', help="새 분기 데이터를 분기별 파티션으로 추가")
+    ingest_parser.add_argument('name', choices=['streamlit_df', 'quarter_df'], help="추가할 데이터셋")
+    ingest_parser.add_argument('path', help="추가할 분기의 CSV (노트북 병합 결과와 같은 컬럼)")
+
+    memory_parser = subparsers.add_parser('memory', help="타입 규칙 적용 전후의 메모리 사용량 비교")
+    memory_parser.add_argument('names', nargs='*', default=['streamlit_df', 'quarter_df'], help="비교할 데이터셋 (기본: streamlit_df quarter_df)")
+    memory_parser.add_argument('--top', type=int, default=10, help="메모리를 많이 쓰는 컬럼 표시 개수")
+
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        for path in ingest_partition(args.name, args.path):
+            print(f"{args.name}: {args.path} -> {path} ({os.path.getsize(path):,} bytes)")
+
+    elif args.command == 'memory':
+        for name in args.names:
+            report = memory_report(name)
+            kept = report['타입'].notna()
+            default_bytes, compact_bytes = report['기본_bytes'].sum(), report['bytes'].sum()
+            print(f"{name}: 기본 타입 {default_bytes / 2**20:,.2f}MB ({len(report)}컬럼) -> "
+                  f"{compact_bytes / 2**20:,.2f}MB ({kept.sum()}컬럼), {1 - compact_bytes / default_bytes:.0%} 감소")
+            print("  타입별: " + ', '.join(f"{dtype} {count}개" for dtype, count in report.loc[kept, '타입'].value_counts().items()))
+            top = report[kept].sort_values('bytes', ascending=False).head(args.top)
+            print(top.to_string(formatters={'기본_bytes': '{:,.0f}'.format, 'bytes': '{:,.0f}'.format}))
+
+    elif args.command == 'snapshot':
+        for name in args.names:
+            path = build_snapshot(name)
+            print(f"{name}: {DATASETS[name][0]} ({os.path.getsize(DATASETS[name][0]):,} bytes) -> {path} ({os.path.getsize(path):,} bytes)")
@@ -0,0 +1,205 @@
+# -*- coding:utf-8 -*-
+import os
+import re
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.preprocessing import StandardScaler
+
+# 학습에 사용하지 않는 컬럼 (ML_final.ipynb)
+DROP_COLUMNS = ['영역_면적', '상권_코드', '자치구_코드', '행정동_코드', '자치구_코드_명', '평일_유동인구_수_평균',
+                '주말_유동인구_수_평균', '소득_구간_코드', '점포_수', '개업_율', '폐업_률', '프랜차이즈_점포_수']
+
+# 종속변수
+TARGET = '시간대_매출금액'
+
+# 숫자형 변수 (학습 데이터 컬럼 순서)
+NUMERIC_FEATURES = ['기준_년', '시간대_유동인구_수', '총_직장_인구_수',
+                    '연령대_10_직장인구_비율', '연령대_20_직장인구_비율', '연령대_30_직장인구_비율',
+                    '연령대_40_직장인구_비율', '연령대_50_직장인구_비율', '연령대_60_이상_직장_인구_비율',
+                    '총_상주인구_수', '연령대_10_상주인구_비율', '연령대_20_상주인구_비율', '연령대_30_상주인구_비율',
+                    '연령대_40_상주인구_비율', '연령대_50_상주인구_비율', '연령대_60_이상_상주인구_비율',
+                    '총_가구_수', '집객시설_수', '월_평균_소득_금액', '지출_총금액',
+                    '유사_업종_점포_수', '개업_점포_수', '폐업_점포_수', '편의점_밀도']
+
+# 범주형 변수 (더미화 순서)
+CATEGORY_FEATURES = ['기준_분기', '시간대', '상권_구분_코드_명', '상권_코드_명', '행정동_코드_명']
+
+# 시간대 목록
+TIME_SLOTS = ['00~06', '06~11', '11~14', '14~17', '17~21', '21~24']
+
+# 특수 문자를 제거하고 언더스코어(_)로 대체
+def clean_feature_name(name):
+    return re.sub(r'\W+', '_', name)
+
+# 편의점 밀도 피처 추가
+def add_density(df):
+    df['편의점_밀도'] = df['유사_업종_점포_수'] / df['영역_면적']
+    return df
+
+
+# 모델 입력 행렬을 만드는 인코더
+# - 학습 데이터에서 범주형 변수의 값 목록을 한 번만 학습 (pd.get_dummies와 같은 컬럼 순서/이름)
+# - transform은 미리 할당한 0 행렬에 숫자형 값과 원-핫 위치만 채워 넣음
+# - 학습 때 없던 범주 값은 해당 그룹의 더미가 모두 0
+class FeatureEncoder:
+    def __init__(self, categories, numeric_features=NUMERIC_FEATURES):
+        self.numeric_features = list(numeric_features)
+        self.categories = {col: list(values) for col, values in categories.items()}
+
+        self.feature_names = [clean_feature_name(col) for col in self.numeric_features]
+        for col, values in self.categories.items():
+            self.feature_names += [clean_feature_name(f'{col}_{value}') for value in values]
+
+        # 범주형 변수별 원-핫 컬럼 시작 위치
+        self._offsets = {}
+        offset = len(self.numeric_features)
+        for col, values in self.categories.items():
+            self._offsets[col] = offset
+            offset += len(values)
+
+    # 학습 데이터에서 범주 값 목록 학습
+    @classmethod
+    def fit(cls, data, cat_cols=CATEGORY_FEATURES, numeric_features=NUMERIC_FEATURES):
+        categories = {col: sorted(pd.unique(data[col].dropna())) for col in cat_cols}
+        return cls(categories, numeric_features)
+
+    @property
+    def n_features(self):
+        return len(self.feature_names)
+
+    # 범주형 변수별 첫 원-핫 컬럼 위치
+    @property
+    def group_starts(self):
+        return np.array([self._offsets[col] for col in self.categories], dtype=np.int64)
+
+    # 숫자형 변수가 들어가는 컬럼 범위
+    @property
+    def numeric_slice(self):
+        return slice(0, len(self.numeric_features))
+
+    # 범주 값을 원-핫 컬럼 위치로 변환 (없는 값은 -1)
+    def category_positions(self, col, values):
+        codes = pd.Categorical(values, categories=self.categories[col]).codes.astype(np.int64)
+        return np.where(codes >= 0, codes + self._offsets[col], -1)
+
+    # DataFrame(또는 컬럼별 배열 dict) -> (숫자형 변수 행렬, 범주형 변수별 원-핫 컬럼 위치 행렬)
+    # 원-핫 행렬 없이 행마다 범주형 변수 수만큼의 위치만 가짐
+    def encode(self, data):
+        n_rows = len(data[self.numeric_features[0]])
+        numeric = np.empty((n_rows, len(self.numeric_features)), dtype=np.float64)
+        for i, col in enumerate(self.numeric_features):
+            numeric[:, i] = np.asarray(data[col], dtype=np.float64)
+
+        positions = np.empty((n_rows, len(self.categories)), dtype=np.int64)
+        for i, col in enumerate(self.categories):
+            positions[:, i] = self.category_positions(col, np.asarray(data[col]))
+        return numeric, positions
+
+    # (숫자형 변수 행렬, 원-핫 컬럼 위치 행렬) -> 모델 컬럼 순서의 CSR 행렬
+    # 행마다 숫자형 변수 + 범주형 변수 수만큼만 값을 가지므로 메모리가 상권/행정동 수와 관계없이 행 수에 비례
+    # (범주형 변수의 원-핫 컬럼은 변수 순서대로 이어 붙어 있어 행 안의 열 번호가 오름차순)
+    def to_csr(self, numeric, positions):
+        n_rows, n_numeric = numeric.shape
+        known = positions >= 0
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(n_numeric + known.sum(axis=1), out=indptr[1:])
+
+        columns = np.hstack([np.broadcast_to(np.arange(n_numeric), (n_rows, n_numeric)), positions])
+        values = np.hstack([numeric, np.ones(positions.shape, dtype=np.float64)])
+        mask = np.hstack([np.ones((n_rows, n_numeric), dtype=bool), known])
+        return sp.csr_matrix((values[mask], columns[mask], indptr), shape=(n_rows, self.n_features))
+
+    # DataFrame(또는 컬럼별 배열 dict) -> 모델 컬럼 순서의 float64 행렬
+    def transform(self, data):
+        numeric, positions = self.encode(data)
+        X = np.zeros((len(numeric), self.n_features), dtype=np.float64)
+        X[:, self.numeric_slice] = numeric
+
+        rows = np.repeat(np.arange(len(positions)), positions.shape[1])
+        positions = positions.ravel()
+        known = positions >= 0
+        X[rows[known], positions[known]] = 1.0
+        return X
+
+
+# 모델 파일 옆에 저장되는 전처리 파일 경로
+def preprocessor_path(model_path):
+    return os.path.splitext(model_path)[0] + '_preprocessing.pkl'
+
+
+# 학습 때 사용한 전처리 (인코더 + 숫자형 변수 정규화 통계)
+# - 예측 시에는 저장된 평균/표준편차로 (x - mean) / scale 만 적용하므로 입력 행 수와 관계없이 결과가 같음
+# - 파일에는 클래스 대신 기본 타입(dict, list, ndarray)만 저장
+class Preprocessor:
+    def __init__(self, encoder, mean, scale):
+        self.encoder = encoder
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+
+    @property
+    def feature_names(self):
+        return self.encoder.feature_names
+
+    # 학습에 사용한 StandardScaler로부터 생성 (columns: scaler를 학습할 때의 컬럼 순서)
+    @classmethod
+    def from_scaler(cls, encoder, scaler, columns):
+        position = {col: i for i, col in enumerate(columns)}
+        order = [position[col] for col in encoder.numeric_features]
+        return cls(encoder, scaler.mean_[order], scaler.scale_[order])
+
+    # 학습 데이터 전체로 인코더와 정규화 통계 학습 (ML_final.ipynb와 동일하게 분할 전 데이터 사용)
+    @classmethod
+    def fit(cls, data, cat_cols=CATEGORY_FEATURES, numeric_features=NUMERIC_FEATURES):
+        encoder = FeatureEncoder.fit(data, cat_cols, numeric_features)
+        scaler = StandardScaler().fit(encoder.transform(data)[:, encoder.numeric_slice])
+        return cls(encoder, scaler.mean_, scaler.scale_)
+
+    # 숫자형 변수 정규화 (입력 행렬을 직접 수정)
+    def scale_numeric(self, X):
+        numeric = X[:, self.encoder.numeric_slice]
+        numeric -= self.mean
+        numeric /= self.scale
+        return X
+
+    # DataFrame -> 정규화까지 끝난 모델 입력 행렬
+    def transform(self, data):
+        return self.scale_numeric(self.encoder.transform(data))
+
+    # DataFrame -> (정규화까지 끝난 숫자형 변수 행렬, 원-핫 컬럼 위치 행렬)
+    def encode(self, data):
+        numeric, positions = self.encoder.encode(data)
+        numeric -= self.mean
+        numeric /= self.scale
+        return numeric, positions
+
+    # DataFrame -> 정규화까지 끝난 CSR 모델 입력 행렬 (transform과 같은 값, LightGBM에 그대로 입력)
+    def transform_sparse(self, data):
+        return self.encoder.to_csr(*self.encode(data))
+
+    def to_dict(self):
+        return {
+            'feature_names': self.feature_names,
+            'numeric_features': self.encoder.numeric_features,
+            'categories': self.encoder.categories,
+            'mean': self.mean,
+            'scale': self.scale,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        encoder = FeatureEncoder(state['categories'], state['numeric_features'])
+        if encoder.feature_names != list(state['feature_names']):
+            raise ValueError("전처리 파일의 컬럼 순서가 인코더와 다릅니다.")
+        return cls(encoder, state['mean'], state['scale'])
+
+    # 다른 프로세스가 읽는 도중에 바뀌지 않도록 임시 파일에 쓰고 교체
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        joblib.dump(self.to_dict(), tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_dict(joblib.load(path))
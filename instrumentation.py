@@ -0,0 +1,142 @@
+# -*- coding:utf-8 -*-
+import os
+import json
+import time
+import threading
+import logging
+from contextlib import contextmanager
+
+# 지표를 내보낼 Prometheus textfile 경로 (node_exporter textfile collector 등, 비어 있으면 쓰지 않음)
+METRICS_FILE = os.environ.get('APP_METRICS_FILE', '')
+
+# 지표 이름 앞에 붙는 접두사
+METRIC_PREFIX = 'convenience_app'
+
+logger = logging.getLogger(__name__)
+
+# 현재 프로세스의 메모리 사용량 (RSS, bytes)
+# /proc이 없는 환경에서는 최대 사용량(ru_maxrss)으로 대신함
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# 구간별 실행 시간/메모리 증감 기록
+# - 진행 중인 실행(rerun)의 구간 목록은 스레드별로 기록 (Streamlit은 세션마다 다른 스레드에서 스크립트 실행)
+# - 구간별 누적 값(횟수, 합계, 최대)은 프로세스 전체에서 공유
+class Instrumentation:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stages = {}
+        self._collectors = []
+        self.runs = 0
+
+    @contextmanager
+    def stage(self, name):
+        records = getattr(self._local, 'records', None)
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        rss = rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            memory = rss_bytes() - rss
+            self._local.depth = depth
+            if records is not None:
+                records.append({'stage': name, 'depth': depth, 'offset': start - self._local.started,
+                                'seconds': seconds, 'memory_bytes': memory})
+            with self._lock:
+                stats = self._stages.setdefault(name, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'memory_bytes': 0})
+                stats['count'] += 1
+                stats['seconds'] += seconds
+                stats['max_seconds'] = max(stats['max_seconds'], seconds)
+                stats['memory_bytes'] += memory
+
+    # 실행(rerun) 시작: 이후 구간은 이 실행의 기록에도 추가
+    def start_run(self):
+        self._local.records = []
+        self._local.depth = 0
+        self._local.started = time.perf_counter()
+
+    # 실행 종료: 구간 기록을 로그로 남기고 지표 파일 갱신, 이 실행의 구간 목록 반환 (시작 순)
+    def finish_run(self, **fields):
+        records = sorted(getattr(self._local, 'records', None) or [], key=lambda record: record['offset'])
+        self._local.records = None
+        with self._lock:
+            self.runs += 1
+
+        logger.info(json.dumps({'event': 'run', **fields, 'rss_bytes': rss_bytes(),
+                                'stages': [{**record, 'offset': round(record['offset'], 6), 'seconds': round(record['seconds'], 6)}
+                                           for record in records]},
+                               ensure_ascii=False))
+        if METRICS_FILE:
+            self.write_metrics(METRICS_FILE)
+        return records
+
+    # 구간별 누적 값
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stages.items()}
+
+    # 다른 모듈의 지표 추가 (collector: 이름 -> (종류, 값) dict를 반환하는 함수)
+    def register_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self.runs = 0
+
+    # Prometheus text exposition 형식
+    def prometheus_text(self):
+        stages = self.snapshot()
+        with self._lock:
+            collectors = list(self._collectors)
+        lines = [
+            f'# HELP {METRIC_PREFIX}_runs_total 스크립트 실행(rerun) 횟수',
+            f'# TYPE {METRIC_PREFIX}_runs_total counter',
+            f'{METRIC_PREFIX}_runs_total {self.runs}',
+            f'# HELP {METRIC_PREFIX}_rss_bytes 프로세스 메모리 사용량',
+            f'# TYPE {METRIC_PREFIX}_rss_bytes gauge',
+            f'{METRIC_PREFIX}_rss_bytes {rss_bytes()}',
+        ]
+        # (지표 이름, 종류, 설명, [(접미사, 값 키)]) - 메모리 증감은 음수가 될 수 있으므로 gauge
+        for metric, kind, help_text, series in [
+            ('stage_seconds', 'summary', '구간 실행 시간 (초)', [('_sum', 'seconds'), ('_count', 'count')]),
+            ('stage_seconds_max', 'gauge', '구간 실행 시간 최대 (초)', [('', 'max_seconds')]),
+            ('stage_memory_delta_bytes', 'gauge', '구간 메모리 증감 합계', [('', 'memory_bytes')]),
+        ]:
+            lines.append(f'# HELP {METRIC_PREFIX}_{metric} {help_text}')
+            lines.append(f'# TYPE {METRIC_PREFIX}_{metric} {kind}')
+            for name, stats in sorted(stages.items()):
+                for suffix, key in series:
+                    lines.append(f'{METRIC_PREFIX}_{metric}{suffix}{{stage="{name}"}} {stats[key]}')
+        for collector in collectors:
+            for name, (kind, value) in collector().items():
+                lines.append(f'# TYPE {METRIC_PREFIX}_{name} {kind}')
+                lines.append(f'{METRIC_PREFIX}_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    # 수집기가 쓰다 만 파일을 읽지 않도록 임시 파일에 쓰고 교체
+    def write_metrics(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+instrumentation = Instrumentation()
+stage = instrumentation.stage
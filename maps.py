@@ -0,0 +1,150 @@
+# -*- coding:utf-8 -*-
+import threading
+import numpy as np
+import pandas as pd
+import folium
+from branca.colormap import LinearColormap
+from shapely.geometry import mapping
+
+# 지도 중심 (강남구)
+MAP_CENTER = [37.5172, 127.0473]
+MAP_ZOOM = 13
+MAP_HEIGHT = 500
+
+# 지표별 (컬럼, 원 반지름 = 값 / 나눗수, 라벨 = 값 / 나눗수 + 단위)
+MAP_METRICS = {
+    '유동인구': ('총_유동인구_수', 100000, 10000, '만'),
+    '상주인구': ('총_상주인구_수', 200, 1000, '천'),
+    '매출': ('점포당_매출액', 10000000, 1000000, '백만'),
+    '점포수': ('유사_업종_점포_수', 1, 1, ''),
+}
+
+# 상권 경계가 있으면 경계를 색으로 칠해서(choropleth) 보여주는 지표
+CHOROPLETH_METRICS = {'매출': '점포당 매출액 (원)'}
+CHOROPLETH_COLORS = ['#ffffb2', '#fecc5c', '#fd8d3c', '#f03b20', '#bd0026']
+
+# 값 표시 라벨 스타일 (배경 없는 글자만 표시)
+LABEL_STYLE = ("background: transparent; border: none; box-shadow: none; padding: 0; "
+               "font-size: 8pt; font-weight: bold; white-space: nowrap;")
+
+# 천 단위 구분 기호를 넣은 정수 문자열
+def format_number(values):
+    return values.map('{:,.0f}'.format)
+
+# 지표별 원 반지름과 라벨 배열 계산
+def metric_arrays(df, option):
+    column, radius_div, label_div, unit = MAP_METRICS[option]
+    values = df[column].to_numpy(dtype=np.float64)
+    radius = values / radius_div
+    labels = np.char.add(np.trunc(values / label_div).astype(np.int64).astype(str), unit)
+    return radius, labels
+
+# 마우스를 올리면 보이는 상권 정보 (순위표로 그리면 선택한 지표의 순위도 표시)
+def tooltip_texts(df):
+    texts = ("상권명: " + df['상권_코드_명'].astype(str) + "<br>"
+             + "매출금액: " + format_number(df['당월_매출_금액']) + "원<br>"
+             + "유동인구: " + format_number(df['총_유동인구_수']) + "명<br>"
+             + "총상주인구: " + format_number(df['총_상주인구_수']) + "명<br>"
+             + "점포수: " + format_number(df['유사_업종_점포_수']) + "개<br>")
+    if '순위' in df.columns:
+        texts = texts + "순위: " + df['순위'].astype(str) + f"/{len(df)}위<br>"
+    return texts
+
+# 상권 목록 -> GeoJSON FeatureCollection 2개 (원 + 툴팁, 값 라벨)
+def build_feature_collections(df, option):
+    radius, labels = metric_arrays(df, option)
+    tooltips = tooltip_texts(df)
+
+    coordinates = np.round(df[['경도', '위도']].to_numpy(dtype=np.float64), 6).tolist()
+    # id가 있어야 folium이 긴 툴팁 문자열 대신 id로 스타일을 매핑함
+    circles = {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'id': i, 'geometry': {'type': 'Point', 'coordinates': point},
+         'properties': {'radius': round(float(r), 2), 'tooltip': tooltip}}
+        for i, (point, r, tooltip) in enumerate(zip(coordinates, radius, tooltips.tolist()))
+    ]}
+    values = {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': point},
+         'properties': {'label': str(label)}}
+        for point, label in zip(coordinates, labels)
+    ]}
+    return circles, values
+
+# 상권 목록 + 상권 경계 -> 지표 값으로 색을 칠한 경계 FeatureCollection, 색상 범례
+# boundaries: 상권_코드_명, geometry(WGS84) 컬럼의 DataFrame (경계가 없는 상권은 제외)
+def build_choropleth_collection(df, option, boundaries):
+    column = MAP_METRICS[option][0]
+    positions = pd.Index(df['상권_코드_명'].astype(str)).get_indexer(boundaries['상권_코드_명'])
+    known = positions >= 0
+    geometries, positions = boundaries['geometry'].to_numpy()[known], positions[known]
+
+    values = df[column].to_numpy(dtype=np.float64)
+    colormap = LinearColormap(CHOROPLETH_COLORS, vmin=values.min(), vmax=values.max(),
+                              caption=CHOROPLETH_METRICS[option])
+    tooltips = tooltip_texts(df).to_numpy()
+
+    collection = {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'id': i, 'geometry': mapping(geometry),
+         'properties': {'color': colormap(values[position]), 'tooltip': tooltips[position]}}
+        for i, (geometry, position) in enumerate(zip(geometries, positions))
+    ]}
+    return collection, colormap
+
+# 지표별 folium 지도 생성 (상권마다 마커 2개를 추가하는 대신 GeoJSON 레이어 2개)
+# 상권 경계(boundaries)가 있고 경계로 보여주는 지표면 원 대신 경계를 색으로 칠함
+def build_map(df, option, boundaries=None):
+    circles, values = build_feature_collections(df, option)
+    m = folium.Map(location=MAP_CENTER, zoom_start=MAP_ZOOM)
+
+    if boundaries is not None and option in CHOROPLETH_METRICS:
+        # 경계 표시 (색은 feature 속성, 마우스를 올리면 상권 정보)
+        collection, colormap = build_choropleth_collection(df, option, boundaries)
+        folium.GeoJson(
+            collection,
+            style_function=lambda feature: {'fillColor': feature['properties']['color'], 'fillOpacity': 0.6,
+                                            'color': '#555555', 'weight': 1},
+            tooltip=folium.GeoJsonTooltip(fields=['tooltip'], labels=False),
+        ).add_to(m)
+        colormap.add_to(m)
+    else:
+        # 원 표시 (반지름은 feature 속성, 마우스를 올리면 상권 정보)
+        folium.GeoJson(
+            circles,
+            marker=folium.CircleMarker(stroke=False, fill_color='orange', fill_opacity=0.4),
+            style_function=lambda feature: {'radius': feature['properties']['radius']},
+            tooltip=folium.GeoJsonTooltip(fields=['tooltip'], labels=False),
+        ).add_to(m)
+
+    # 값 표시 (항상 보이는 라벨)
+    folium.GeoJson(
+        values,
+        marker=folium.CircleMarker(radius=0, stroke=False, fill=False),
+        tooltip=folium.GeoJsonTooltip(fields=['label'], labels=False, permanent=True,
+                                      direction='center', style=LABEL_STYLE),
+    ).add_to(m)
+    return m
+
+# 지도 HTML 생성
+def render_map(df, option, boundaries=None):
+    return folium.Figure().add_child(build_map(df, option, boundaries)).render()
+
+
+# 렌더링된 지도 HTML 캐시 ((지표, 분기)별, 모든 세션에서 공유)
+# 데이터나 경계가 다시 로드되어 다른 DataFrame이 들어오면 HTML을 다시 만듦
+class MapCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, df, option, boundaries=None, period=None):
+        key = (option, period)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is df and entry[1] is boundaries:
+                return entry[2]
+        html = render_map(df, option, boundaries)
+        with self._lock:
+            self._entries[key] = (df, boundaries, html)
+        return html
+
+
+map_cache = MapCache()
@@ -0,0 +1,188 @@
+# -*- coding:utf-8 -*-
+import os
+import hashlib
+import threading
+import logging
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from cachetools import TTLCache
+from scipy.special import inv_boxcox
+from data_loader import file_hash
+from features import Preprocessor, preprocessor_path
+from instrumentation import instrumentation
+
+# 모델 파일 경로
+MODEL_PATH = "model/best_lgbm_regression_model.pkl"
+
+logger = logging.getLogger(__name__)
+
+
+# 분위수 표시 이름 (0.1 -> P10)
+def quantile_label(quantile):
+    return f'P{quantile * 100:.0f}'
+
+
+# 로드된 모델 정보 (모델, Box-Cox lambda, 학습 때의 전처리, 예측 구간용 분위수 모델)
+class ModelEntry:
+    def __init__(self, model, lambda_, preprocessor, version, quantile_models=None):
+        self.model = model
+        self.lambda_ = lambda_
+        self.preprocessor = preprocessor
+        self.version = version
+        self.booster = model.booster_
+        self.feature_names = list(model.feature_name_)
+        self.validate(preprocessor.feature_names)
+
+        # 분위수 오름차순 (분위수 모델이 없는 이전 모델 파일이면 비어 있음)
+        self.quantile_models = dict(sorted((quantile_models or {}).items()))
+        self.quantiles = list(self.quantile_models)
+        for quantile, quantile_model in self.quantile_models.items():
+            if list(quantile_model.feature_name_) != self.feature_names:
+                raise ValueError(f"모델({self.version})의 {quantile_label(quantile)} 분위수 모델 피처가 본 모델과 다릅니다.")
+        self._quantile_boosters = [quantile_model.booster_ for quantile_model in self.quantile_models.values()]
+
+    # 입력 컬럼 이름이 모델의 피처 이름과 일치하는지 확인
+    def validate(self, columns):
+        columns = list(columns)
+        column_set, feature_set = set(columns), set(self.feature_names)
+        missing = [col for col in self.feature_names if col not in column_set]
+        extra = [col for col in columns if col not in feature_set]
+        if missing or extra:
+            raise ValueError(f"모델({self.version}) 피처와 입력 컬럼이 다릅니다. 없는 컬럼: {missing}, 불필요한 컬럼: {extra}")
+        if columns != self.feature_names:
+            raise ValueError(f"모델({self.version}) 피처와 입력 컬럼의 순서가 다릅니다.")
+
+    # 입력 행렬 -> 추정 매출 (Box-Cox 역변환까지 적용)
+    # sklearn 래퍼(LGBMRegressor.predict)의 입력 검사를 거치지 않고 부스터를 바로 호출 (결과는 같음)
+    def predict_sales(self, X):
+        return inv_boxcox(self.booster.predict(X), self.lambda_)
+
+    # 입력 행렬 -> (추정 매출, 분위수별 추정 매출 (n_rows x 분위수 수, 분위수 모델이 없으면 n_rows x 0))
+    # - 본 모델과 분위수 모델 부스터를 같은 입력 행렬로 각각 호출
+    # - Box-Cox 역변환은 전체 (n_rows x (1 + 분위수 수)) 행렬에 한 번만 적용
+    # - 분위수 모델은 따로 학습되어 분위수가 뒤바뀌는 행이 있으므로 행마다 정렬해서 맞춤
+    def predict_range(self, X):
+        n_rows = X.shape[0]
+        quantiles = np.empty((n_rows, 0))
+        if self._quantile_boosters:
+            quantiles = np.column_stack([booster.predict(X) for booster in self._quantile_boosters])
+        sales = inv_boxcox(np.column_stack([self.booster.predict(X), quantiles]), self.lambda_)
+        return sales[:, 0], np.sort(sales[:, 1:], axis=1)
+
+
+# 프로세스 전체에서 공유하는 모델 저장소
+# - (model, lambda_, 분위수 모델 dict) 튜플과 전처리 파일을 한 번만 로드해 두고 재사용 (분위수 모델이 없는 (model, lambda_)도 읽음)
+# - 파일이 바뀌면(수정 시각/크기 변경 + 내용 해시 변경) 재시작 없이 새 모델로 교체
+# - 새 파일을 읽다가 실패하면 기존 모델을 계속 사용
+class ModelRegistry:
+    def __init__(self, path=MODEL_PATH):
+        self.path = path
+        self.paths = [path, preprocessor_path(path)]
+        self._lock = threading.Lock()
+        self._stat = None
+        self._entry = None
+
+    def get(self):
+        stat = tuple((os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in self.paths)
+        if self._entry is not None and self._stat == stat:
+            return self._entry
+
+        with self._lock:
+            if self._entry is not None and self._stat == stat:
+                return self._entry
+
+            version = '-'.join(file_hash(path)[:12] for path in self.paths)
+            if self._entry is None or self._entry.version != version:
+                try:
+                    model, lambda_, *quantile_models = joblib.load(self.path)
+                    preprocessor = Preprocessor.load(self.paths[1])
+                    self._entry = ModelEntry(model, lambda_, preprocessor, version, *quantile_models)
+                    logger.info("모델 로드: %s (%s)", self.path, version)
+                except Exception:
+                    if self._entry is None:
+                        raise
+                    # 같은 파일을 매번 다시 읽지 않도록 파일 상태는 기록
+                    logger.exception("모델 교체 실패, 기존 모델(%s)을 계속 사용합니다.", self._entry.version)
+            self._stat = stat
+            return self._entry
+
+
+registry = ModelRegistry()
+
+
+# 예측 결과 캐시 (모든 세션에서 공유)
+# - 키: 정규화까지 끝난 입력 행렬의 해시 + 모델 버전
+# - 오래 쓰지 않은 항목부터 지우고(LRU), ttl초가 지나면 만료
+# - 모델 버전이 바뀌면 전체 비움
+class PredictionCache:
+    def __init__(self, maxsize=1024, ttl=3600):
+        self._lock = threading.Lock()
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_entry, X, kind='sales'):
+        digest = hashlib.sha1()
+        if sp.issparse(X):
+            X = sp.csr_matrix(X)
+            for part, dtype in [(X.indptr, np.int64), (X.indices, np.int64), (X.data, np.float64)]:
+                digest.update(np.ascontiguousarray(part, dtype=dtype).tobytes())
+        else:
+            X = np.ascontiguousarray(X, dtype=np.float64)
+            digest.update(X.tobytes())
+        return (model_entry.version, kind, sp.issparse(X), X.shape, digest.hexdigest())
+
+    # 캐시에 없으면 predict(X)로 계산해서 저장 (결과는 배열 또는 배열 튜플, 호출한 쪽에서 바꿔도 되도록 복사본 반환)
+    def _get(self, model_entry, X, kind, predict):
+        key = self.make_key(model_entry, X, kind)
+
+        with self._lock:
+            if self._version != model_entry.version:
+                self._cache.clear()
+                self._version = model_entry.version
+            prediction = self._cache.get(key)
+            if prediction is not None:
+                self.hits += 1
+                return self._copy(prediction)
+            self.misses += 1
+
+        prediction = predict(X)
+        with self._lock:
+            if self._version == model_entry.version:
+                self._cache[key] = prediction
+        return self._copy(prediction)
+
+    @staticmethod
+    def _copy(prediction):
+        return tuple(part.copy() for part in prediction) if isinstance(prediction, tuple) else prediction.copy()
+
+    def predict_sales(self, model_entry, X):
+        return self._get(model_entry, X, 'sales', model_entry.predict_sales)
+
+    def predict_range(self, model_entry, X):
+        return self._get(model_entry, X, 'range', model_entry.predict_range)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._cache)}
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+prediction_cache = PredictionCache()
+
+# 예측 캐시 지표 (Prometheus)
+def prediction_cache_metrics():
+    stats = prediction_cache.stats()
+    return {
+        'prediction_cache_hits_total': ('counter', stats['hits']),
+        'prediction_cache_misses_total': ('counter', stats['misses']),
+        'prediction_cache_size': ('gauge', stats['size']),
+    }
+
+instrumentation.register_collector(prediction_cache_metrics)
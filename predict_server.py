@@ -0,0 +1,260 @@
+# -*- coding:utf-8 -*-
+import json
+import asyncio
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import tornado.web
+import data_loader
+import features
+import batch_predict
+import model_registry
+
+# 기본 포트
+PORT = 8000
+
+# 마이크로 배치: 첫 요청 후 최대 MAX_DELAY초 동안 모인 요청을 최대 MAX_BATCH_ROWS행까지 한 번에 예측
+MAX_BATCH_ROWS = 4096
+MAX_DELAY = 0.002
+
+# 요청에서 바꿀 수 있는 입력 항목 (편의점_밀도는 유사_업종_점포_수 / 영역_면적으로 계산)
+OVERRIDE_COLUMNS = ['기준_분기', '영역_면적'] + [col for col in features.NUMERIC_FEATURES if col != '편의점_밀도']
+
+# 0보다 커야 하는 항목 (점포당 매출, 편의점_밀도 계산의 분모)
+POSITIVE_COLUMNS = ['유사_업종_점포_수', '영역_면적']
+
+# 정수 항목의 허용 범위 (양 끝 포함)
+INTEGER_RANGES = {'기준_년': (2000, 2100), '기준_분기': (1, 4)}
+
+# 모델 입력에 필요한 컬럼 (편의점_밀도를 제외한 숫자형 + 범주형 + 영역_면적)
+INPUT_COLUMNS = [col for col in features.NUMERIC_FEATURES if col != '편의점_밀도'] \
+                + features.CATEGORY_FEATURES + ['영역_면적']
+
+logger = logging.getLogger(__name__)
+
+
+# 동시에 들어온 요청을 모아서 한 번의 transform + predict로 처리
+# - 요청마다 컬럼별 배열 dict를 큐에 넣고 결과를 기다림
+# - 예측은 별도 스레드에서 실행해서 예측 중에도 다음 요청을 받음
+class MicroBatcher:
+    def __init__(self, max_rows=MAX_BATCH_ROWS, max_delay=MAX_DELAY):
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.queue = None
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        return asyncio.ensure_future(self.run())
+
+    # 컬럼별 배열 dict -> (행별 추정 매출, 행별 분위수별 추정 매출, 분위수 이름, 모델 버전)
+    async def predict(self, columns):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((columns, future))
+        return await future
+
+    async def collect(self):
+        loop = asyncio.get_running_loop()
+        items = [await self.queue.get()]
+        rows = len(items[0][0]['시간대'])
+        deadline = loop.time() + self.max_delay
+        while rows < self.max_rows:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            items.append(item)
+            rows += len(item[0]['시간대'])
+        return items
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self.collect()
+            try:
+                (predictions, ranges), labels, version = await loop.run_in_executor(
+                    self.executor, self.predict_batch, [columns for columns, _ in items])
+            except Exception as e:
+                logger.exception("일괄 예측 실패")
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.requests += len(items)
+            self.rows += len(predictions)
+            start = 0
+            for columns, future in items:
+                end = start + len(columns['시간대'])
+                if not future.done():
+                    future.set_result((predictions[start:end], ranges[start:end], labels, version))
+                start = end
+
+    # 모인 요청을 이어 붙여 한 번에 예측 (모델 파일이 바뀌었으면 새 모델 사용, 분위수 모델도 같은 입력 행렬로 예측)
+    @staticmethod
+    def predict_batch(payloads):
+        model_entry = model_registry.registry.get()
+        data = {col: np.concatenate([payload[col] for payload in payloads]) for col in payloads[0]}
+        X = model_entry.preprocessor.transform_sparse(data)
+        labels = [model_registry.quantile_label(quantile) for quantile in model_entry.quantiles]
+        return model_entry.predict_range(X), labels, model_entry.version
+
+    def stats(self):
+        return {'batches': self.batches, 'requests': self.requests, 'rows': self.rows,
+                'rows_per_batch': self.rows / self.batches if self.batches else 0.0}
+
+
+# 예측 요청 -> 모델 입력
+# 상권별 기본값은 매출 예측 페이지와 같은 가장 최근 분기의 시간대별 6행
+class PredictionService:
+    def __init__(self, quarter_df, batcher):
+        self.batcher = batcher
+        base = batch_predict.latest_rows(quarter_df)
+        slot_order = {slot: i for i, slot in enumerate(features.TIME_SLOTS)}
+        self.defaults = {}
+        for name, positions in base.groupby('상권_코드_명', observed=True).indices.items():
+            rows = base.iloc[positions]
+            rows = rows.iloc[np.argsort(rows['시간대'].map(slot_order).to_numpy())]
+            self.defaults[name] = {col: rows[col].to_numpy() for col in INPUT_COLUMNS}
+
+    # 요청 하나(상권 x 분기) -> 시간대별 6행의 컬럼별 배열
+    # 항목 값은 숫자(전체 시간대), 6개 리스트(시간대 순), {시간대: 값} 중 하나
+    def payload_columns(self, payload):
+        if not isinstance(payload, dict):
+            raise ValueError("요청은 JSON 객체(또는 객체 리스트)여야 합니다.")
+        name = payload.get('상권_코드_명')
+        if not isinstance(name, str):
+            raise ValueError("상권_코드_명은 문자열이어야 합니다.")
+        if name not in self.defaults:
+            raise ValueError(f"알 수 없는 상권입니다: {name}")
+
+        columns = {col: values.copy() for col, values in self.defaults[name].items()}
+        for key, value in payload.items():
+            if key == '상권_코드_명':
+                continue
+            if key not in OVERRIDE_COLUMNS:
+                raise ValueError(f"알 수 없는 항목입니다: {key}")
+            columns[key] = self.slot_values(key, value, columns[key])
+
+        columns['편의점_밀도'] = columns['유사_업종_점포_수'] / columns['영역_면적']
+        return columns
+
+    @staticmethod
+    def slot_values(key, value, default):
+        if isinstance(value, dict):
+            unknown = [slot for slot in value if slot not in features.TIME_SLOTS]
+            if unknown:
+                raise ValueError(f"{key}: 알 수 없는 시간대입니다: {unknown}")
+            value = [value.get(slot, default[i]) for i, slot in enumerate(features.TIME_SLOTS)]
+        # JSON true/false는 숫자로 변환되므로 따로 거부
+        if any(isinstance(item, bool) for item in (value if isinstance(value, list) else [value])):
+            raise ValueError(f"{key}: true/false가 아닌 숫자여야 합니다.")
+        try:
+            values = np.broadcast_to(np.asarray(value, dtype=np.float64), default.shape)
+        except (TypeError, ValueError):
+            raise ValueError(f"{key}: 숫자 하나 또는 시간대별 {len(features.TIME_SLOTS)}개 값이어야 합니다.")
+        if not np.isfinite(values).all():
+            raise ValueError(f"{key}: 숫자가 아닌 값이 있습니다.")
+        if key in POSITIVE_COLUMNS and (values <= 0).any():
+            raise ValueError(f"{key}: 0보다 커야 합니다.")
+        if key in data_loader.PARTITION_KEY:
+            if (values != np.round(values)).any():
+                raise ValueError(f"{key}: 정수여야 합니다.")
+            low, high = INTEGER_RANGES[key]
+            if ((values < low) | (values > high)).any():
+                raise ValueError(f"{key}: {low}~{high} 사이의 값이어야 합니다.")
+            return values.astype(np.int64)
+        return values.copy()
+
+    # 요청 목록 -> 요청별 시간대별/전체 추정 매출 (+ 분위수별 전체 추정 매출: 시간대별 분위수의 합)
+    async def predict(self, payloads):
+        columns = [self.payload_columns(payload) for payload in payloads]
+        merged = {col: np.concatenate([payload[col] for payload in columns]) for col in columns[0]}
+        predictions, ranges, labels, version = await self.batcher.predict(merged)
+
+        results = []
+        slots = len(features.TIME_SLOTS)
+        for i, (payload, payload_columns) in enumerate(zip(payloads, columns)):
+            sales = predictions[i * slots:(i + 1) * slots]
+            result = {
+                '상권_코드_명': payload['상권_코드_명'],
+                '기준_년': int(payload_columns['기준_년'][0]),
+                '기준_분기': int(payload_columns['기준_분기'][0]),
+                '시간대별_추정_매출': dict(zip(features.TIME_SLOTS, sales.tolist())),
+                '추정_매출': float(sales.sum()),
+                '점포당_추정_매출': float((sales / payload_columns['유사_업종_점포_수']).sum()),
+            }
+            # 분위수 모델이 없는 모델 파일이면 예측 구간을 넣지 않음
+            if labels:
+                result['분위수별_추정_매출'] = dict(zip(labels, ranges[i * slots:(i + 1) * slots].sum(axis=0).tolist()))
+            results.append(result)
+        return results, version
+
+
+class JsonHandler(tornado.web.RequestHandler):
+    def initialize(self, service):
+        self.service = service
+
+    def write_json(self, data, status=200):
+        self.set_status(status)
+        self.set_header('Content-Type', 'application/json; charset=utf-8')
+        self.finish(json.dumps(data, ensure_ascii=False))
+
+# POST /predict: 요청 객체 하나 또는 객체 리스트
+class PredictHandler(JsonHandler):
+    async def post(self):
+        try:
+            body = json.loads(self.request.body)
+        except ValueError:
+            return self.write_json({'error': "JSON 형식이 아닙니다."}, 400)
+
+        payloads = body if isinstance(body, list) else [body]
+        if not payloads:
+            return self.write_json({'error': "요청이 비어 있습니다."}, 400)
+        try:
+            results, version = await self.service.predict(payloads)
+        except ValueError as e:
+            return self.write_json({'error': str(e)}, 400)
+        self.write_json({'model_version': version, 'predictions': results})
+
+# GET /health: 모델 버전과 마이크로 배치 통계
+class HealthHandler(JsonHandler):
+    def get(self):
+        self.write_json({'model_version': model_registry.registry.get().version,
+                         'districts': len(self.service.defaults), 'batching': self.service.batcher.stats()})
+
+
+def make_app(service):
+    return tornado.web.Application([
+        (r'/predict', PredictHandler, {'service': service}),
+        (r'/health', HealthHandler, {'service': service}),
+    ])
+
+async def serve(port=PORT, max_rows=MAX_BATCH_ROWS, max_delay=MAX_DELAY):
+    # 첫 요청이 느리지 않도록 모델과 데이터를 미리 로드
+    model_registry.registry.get()
+    batcher = MicroBatcher(max_rows, max_delay)
+    service = PredictionService(data_loader.get_quarter_data(INPUT_COLUMNS), batcher)
+    batcher.start()
+    make_app(service).listen(port)
+    logger.info("예측 서버 시작: http://localhost:%d (상권 %d개)", port, len(service.defaults))
+    await asyncio.Event().wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="매출 예측 HTTP/JSON 서버")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--max-batch-rows', type=int, default=MAX_BATCH_ROWS, help="한 번에 예측할 최대 행 수")
+    parser.add_argument('--max-delay-ms', type=float, default=MAX_DELAY * 1000, help="요청을 모으는 최대 대기 시간 (ms)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(args.port, args.max_batch_rows, args.max_delay_ms / 1000))
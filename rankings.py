@@ -0,0 +1,107 @@
+# -*- coding:utf-8 -*-
+import argparse
+import numpy as np
+import pandas as pd
+import data_loader
+
+# 순위를 미리 계산하는 지표: 표시 이름 -> 컬럼 (강남구 상권 분석 순위표/지도와 같은 지표)
+RANK_METRICS = {
+    '유동인구': '총_유동인구_수',
+    '상주인구': '총_상주인구_수',
+    '매출': '점포당_매출액',
+    '점포수': '유사_업종_점포_수',
+}
+
+# 순위표를 만들 때 필요한 컬럼 (지도 툴팁 컬럼 포함)
+RANKING_COLUMNS = ['기준_년', '기준_분기', '상권_코드_명', '행정동_코드_명', '위도', '경도', '당월_매출_금액'] \
+                  + list(RANK_METRICS.values())
+
+# 지표별로 붙는 값: 순위 (1위가 가장 큼), 백분위 (0~100, 클수록 큼), 직전 분기 대비 값 증감, 순위 변화 (양수면 상승)
+RANK_COLUMNS = ['순위', '백분위', '증감', '순위_변화']
+
+
+# (연도, 분기) -> 연속된 분기의 차이가 1인 번호
+def period_number(year, quarter):
+    return year * 4 + quarter - 1
+
+def quarter_label(year, quarter):
+    return f'{year}년 {quarter}분기'
+
+
+# 전체 (분기 x 지표)의 상권 순위/백분위/직전 분기 대비 증감
+# - 분기별 순위는 지표마다 groupby().rank() 한 번, 직전 분기 값은 (상권, 분기 번호 - 1)의 행 위치로 한 번에 조회
+# - (분기, 지표)별 순위표는 순위 순으로 정렬해 두고, 페이지에서는 dict에서 꺼내기만 함
+class RankingTable:
+    def __init__(self, df):
+        df = df.reset_index(drop=True)
+        names = df['상권_코드_명'].astype(str).to_numpy()
+        periods = period_number(df['기준_년'].to_numpy(dtype=np.int64), df['기준_분기'].to_numpy(dtype=np.int64))
+        previous = pd.MultiIndex.from_arrays([names, periods]) \
+            .get_indexer(pd.MultiIndex.from_arrays([names, periods - 1]))
+        has_previous = previous >= 0
+        quarters = df.groupby(['기준_년', '기준_분기'], sort=False)
+
+        # 지표별 (행 x RANK_COLUMNS)
+        stats = {}
+        for option, column in RANK_METRICS.items():
+            values = df[column].to_numpy(dtype=np.float64)
+            rank = quarters[column].rank(ascending=False, method='min').to_numpy()
+            stats[option] = pd.DataFrame({
+                '순위': rank.astype(np.int32),
+                '백분위': quarters[column].rank(pct=True).to_numpy() * 100,
+                '증감': np.where(has_previous, values - values[previous], np.nan),
+                '순위_변화': np.where(has_previous, rank[previous] - rank, np.nan),
+            })
+
+        # (연도, 분기, 지표) -> 순위 순 순위표 (RANKING_COLUMNS + RANK_COLUMNS)
+        self._boards = {}
+        for option, stat in stats.items():
+            board = pd.concat([df, stat], axis=1).sort_values(['기준_년', '기준_분기', '순위'], kind='stable')
+            for (year, quarter), positions in board.groupby(['기준_년', '기준_분기'], sort=False).indices.items():
+                self._boards[(int(year), int(quarter), option)] = board.iloc[positions]
+
+        # 지표별 값과 순위를 지표 순서대로 이어 붙인 표 (지표 x (값 + RANK_COLUMNS))
+        # 행 i의 지표별 값은 i, i + 행 수, i + 2 x 행 수, ... 번째 행 (상권마다 DataFrame을 미리 나누지 않음)
+        self._long = pd.concat([stat.assign(지표=option, 값=df[column].to_numpy(dtype=np.float64))
+                                for (option, column), stat in zip(RANK_METRICS.items(), stats.values())],
+                               ignore_index=True).set_index('지표')[['값'] + RANK_COLUMNS]
+        self._n_rows = len(df)
+        self._positions = {
+            (int(year), int(quarter), name): position
+            for position, (year, quarter, name) in enumerate(zip(df['기준_년'], df['기준_분기'], names))
+        }
+
+        self.quarters = sorted({(year, quarter) for year, quarter, _ in self._boards})
+        self._empty_board = board.iloc[0:0]
+
+    # 특정 분기의 지표 순위표 (순위 순)
+    def board(self, year, quarter, option):
+        return self._boards.get((year, quarter, option), self._empty_board)
+
+    # 특정 분기의 특정 상권의 지표별 값/순위/증감 (지표가 index)
+    def get(self, year, quarter, name):
+        position = self._positions.get((year, quarter, name))
+        if position is None:
+            return self._long.iloc[0:0]
+        return self._long.iloc[position::self._n_rows]
+
+# 캐시를 거쳐 순위표를 가져오는 함수 (데이터가 다시 로드되면 다시 계산)
+def get_rankings(columns=RANKING_COLUMNS):
+    return data_loader.get_derived('streamlit_df', 'rankings', RankingTable, columns)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="분기별 상권 순위표 조회")
+    parser.add_argument('--year', type=int, default=2023)
+    parser.add_argument('--quarter', type=int, default=3)
+    parser.add_argument('--metric', choices=list(RANK_METRICS), default='매출')
+    parser.add_argument('--top', type=int, default=10, help="표시할 상권 수")
+    args = parser.parse_args()
+
+    rankings = get_rankings()
+    board = rankings.board(args.year, args.quarter, args.metric)
+    if board.empty:
+        parser.error(f"{quarter_label(args.year, args.quarter)} 데이터가 없습니다. "
+                     f"(가능한 분기: {', '.join(quarter_label(*key) for key in rankings.quarters)})")
+    print(board[['순위', '상권_코드_명', '행정동_코드_명', RANK_METRICS[args.metric], '백분위', '증감', '순위_변화']]
+          .head(args.top).to_string(index=False))
@@ -0,0 +1,118 @@
+# -*- coding:utf-8 -*-
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import data_loader
+import features
+import batch_predict
+import model_registry
+
+# 민감도 분석에서 바꿀 수 있는 입력 항목: 표시 이름 -> (컬럼, 시간대 (None이면 전체 시간대))
+SWEEP_VARIABLES = {
+    **{f'{slot} 유동인구': ('시간대_유동인구_수', slot) for slot in features.TIME_SLOTS},
+    '총 직장인구': ('총_직장_인구_수', None),
+    '총 상주인구': ('총_상주인구_수', None),
+    '총 가구 수': ('총_가구_수', None),
+    '집객시설 수': ('집객시설_수', None),
+    '월평균 소득금액': ('월_평균_소득_금액', None),
+    '지출 총금액': ('지출_총금액', None),
+    '편의점 점포 수': ('유사_업종_점포_수', None),
+    '개업 점포 수': ('개업_점포_수', None),
+    '폐업 점포 수': ('폐업_점포_수', None),
+}
+
+# 값 범위를 나누는 개수 (항목 하나: 곡선, 항목 두 개: 히트맵의 가로/세로)
+CURVE_POINTS = 50
+HEATMAP_POINTS = 20
+
+# 한 번에 예측하는 최대 격자점 수 (격자점마다 시간대별 6행)
+MAX_GRID_POINTS = 10000
+
+
+# 범위를 points개로 나눈 값 (정수 항목은 반올림 후 중복 제거)
+def sweep_values(low, high, points, integer=True):
+    values = np.linspace(low, high, points)
+    return np.unique(np.round(values)) if integer else values
+
+# 기준 입력(시간대별 6행)에서 항목의 현재 값
+def current_value(base, name):
+    column, slot = SWEEP_VARIABLES[name]
+    rows = base[base['시간대'] == slot] if slot else base
+    return float(rows[column].iloc[0])
+
+# 기준 입력 x 값 격자 -> 격자점마다 시간대별 6행을 이어 붙인 입력 데이터
+# - sweeps: [(항목 이름, 값 배열)] 1~2개, 격자점 순서는 np.meshgrid(indexing='ij')와 같음
+# - 편의점 점포 수를 바꾸면 편의점_밀도도 다시 계산 (base에 영역_면적 필요)
+def build_sweep(base, sweeps):
+    grids = np.meshgrid(*[values for _, values in sweeps], indexing='ij')
+    n_points, n_slots = grids[0].size, len(base)
+    if n_points > MAX_GRID_POINTS:
+        raise ValueError(f"격자점이 너무 많습니다: {n_points:,}개 (최대 {MAX_GRID_POINTS:,}개)")
+
+    data = base.iloc[np.tile(np.arange(n_slots), n_points)].reset_index(drop=True)
+    slots = data['시간대'].to_numpy()
+    for (name, _), grid in zip(sweeps, grids):
+        column, slot = SWEEP_VARIABLES[name]
+        values = np.repeat(grid.ravel(), n_slots)
+        data[column] = np.where(slots == slot, values, data[column]) if slot else values
+
+    if any(SWEEP_VARIABLES[name][0] == '유사_업종_점포_수' for name, _ in sweeps):
+        features.add_density(data)
+    return data, grids
+
+# 격자 전체를 한 번의 transform + predict로 예측 -> 격자점별 추정 매출
+def sweep_predict(model_entry, base, sweeps):
+    data, grids = build_sweep(base, sweeps)
+    X = model_entry.preprocessor.transform_sparse(data)
+    sales = model_entry.predict_sales(X).reshape(-1, len(base))
+    stores = data['유사_업종_점포_수'].to_numpy(dtype=np.float64).reshape(-1, len(base))
+
+    result = pd.DataFrame({name: grid.ravel() for (name, _), grid in zip(sweeps, grids)})
+    result['추정_매출'] = sales.sum(axis=1)
+    result['점포당_추정_매출'] = (sales / stores).sum(axis=1)
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="매출 예측 민감도 분석 (입력 항목 값 범위 전체를 한 번에 예측)")
+    parser.add_argument('district', help="상권명")
+    parser.add_argument('--year', type=int, default=2023)
+    parser.add_argument('--quarter', type=int, default=3)
+    parser.add_argument('--var', action='append', required=True, choices=list(SWEEP_VARIABLES), help="바꿀 항목 (최대 2개)")
+    parser.add_argument('--range', type=float, nargs=2, action='append', metavar=('LOW', 'HIGH'),
+                        help="항목별 값 범위 (기본: 전체 상권의 최소~최대)")
+    parser.add_argument('--points', type=int, help=f"항목별 값 개수 (기본: 항목 1개 {CURVE_POINTS}, 2개 {HEATMAP_POINTS})")
+    parser.add_argument('--output', help="결과를 저장할 CSV 경로")
+    args = parser.parse_args()
+
+    if len(args.var) > 2:
+        parser.error("--var는 최대 2개까지 지정할 수 있습니다.")
+    if args.range and len(args.range) != len(args.var):
+        parser.error("--range는 --var와 같은 개수로 지정해야 합니다.")
+
+    quarter_df = data_loader.get_quarter_data()
+    model_entry = model_registry.registry.get()
+
+    # 매출 예측 페이지의 기본값과 같은 기준 입력 (상권의 가장 최근 분기 값, 예측 분기만 변경)
+    base = batch_predict.latest_rows(quarter_df)
+    base = base[base['상권_코드_명'] == args.district]
+    if base.empty:
+        parser.error(f"알 수 없는 상권입니다: {args.district}")
+    base = batch_predict.build_batch(base, [(args.year, args.quarter)])
+
+    points = args.points or (CURVE_POINTS if len(args.var) == 1 else HEATMAP_POINTS)
+    sweeps = []
+    for i, name in enumerate(args.var):
+        column, _ = SWEEP_VARIABLES[name]
+        low, high = args.range[i] if args.range else (quarter_df[column].min(), quarter_df[column].max())
+        sweeps.append((name, sweep_values(low, high, points)))
+
+    start = time.perf_counter()
+    result = sweep_predict(model_entry, base, sweeps)
+    elapsed = time.perf_counter() - start
+
+    if args.output:
+        result.to_csv(args.output, index=False, encoding='utf-8-sig')
+    print(result.to_string(index=False, formatters={'추정_매출': '{:,.0f}'.format, '점포당_추정_매출': '{:,.0f}'.format}))
+    print(f"{len(result):,}개 조합 ({len(result) * len(base):,}행) 예측 {elapsed * 1000:,.1f}ms")
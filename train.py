@@ -0,0 +1,166 @@
+# -*- coding:utf-8 -*-
+import os
+import argparse
+import time
+import joblib
+import numpy as np
+from scipy.stats import boxcox
+from scipy.special import inv_boxcox
+from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+from sklearn.model_selection import train_test_split, GridSearchCV
+from lightgbm import LGBMRegressor
+import data_loader
+import features
+from features import Preprocessor, preprocessor_path
+from model_registry import MODEL_PATH, quantile_label
+
+# 인코딩한 학습 행렬 캐시 폴더
+CACHE_DIR = "./cache"
+
+# 학습/테스트 분할 (ML_final.ipynb)
+TEST_SIZE = 0.3
+SPLIT_RANDOM_STATE = 1
+MODEL_RANDOM_STATE = 42
+CV = 3
+
+# 탐색할 하이퍼파라미터 범위 (ML_final.ipynb)
+PARAM_GRID = {
+    'num_leaves': [25, 30, 35],
+    'learning_rate': [0.12, 0.13, 0.14],
+    'n_estimators': [375, 400, 425]
+}
+
+# 예측 구간을 만드는 분위수 모델 (P10/P50/P90)
+QUANTILES = [0.1, 0.5, 0.9]
+
+# 분위수 모델 하이퍼파라미터 (본 모델보다 작게 학습)
+# 본 모델과 같은 크기로 학습하면 학습 데이터에 맞춰져 P10~P90 구간이 테스트 데이터의 약 60%만 포함하고 예측 시간도 4배가 됨
+# 이 크기에서는 약 75%를 포함하고, 세 모델의 예측 시간을 합쳐도 본 모델 한 번보다 짧음
+QUANTILE_PARAMS = {'num_leaves': 15, 'learning_rate': 0.1, 'n_estimators': 100}
+
+# 학습에 사용하는 quarter_df 컬럼 (편의점_밀도는 영역_면적으로 계산)
+TRAIN_COLUMNS = [col for col in features.NUMERIC_FEATURES if col != '편의점_밀도'] \
+                + features.CATEGORY_FEATURES + ['영역_면적', features.TARGET]
+
+
+# 학습 데이터 -> (전처리, CSR 입력 행렬, 종속변수)
+# source_sha1은 캐시 키로만 사용 (데이터 파일이 바뀌면 다시 인코딩)
+def encode_training_data(source_sha1):
+    data = features.add_density(data_loader.get_quarter_data(TRAIN_COLUMNS).copy())
+    preprocessor = Preprocessor.fit(data)
+    X = preprocessor.transform_sparse(data)
+    y = data[features.TARGET].to_numpy(dtype=np.float64)
+    return preprocessor.to_dict(), X, y
+
+# 저장된 전처리로 인코딩한 학습 데이터 -> (CSR 입력 행렬, 종속변수) (저장된 본 모델과 같은 입력 컬럼)
+def encode_with(preprocessor):
+    data = features.add_density(data_loader.get_quarter_data(TRAIN_COLUMNS).copy())
+    return preprocessor.transform_sparse(data), data[features.TARGET].to_numpy(dtype=np.float64)
+
+# 캐시를 거쳐 학습 행렬을 가져오는 함수
+def load_training_data(cache_dir=CACHE_DIR):
+    source_sha1 = '-'.join(data_loader.file_hash(path) for path in data_loader.dataset_paths('quarter_df'))
+    encode = joblib.Memory(cache_dir, verbose=0).cache(encode_training_data) if cache_dir else encode_training_data
+    state, X, y = encode(source_sha1)
+    return Preprocessor.from_dict(state), X, y
+
+# 평가 (ML_final.ipynb)
+def evaluate(y_true, y_pred):
+    mse = mean_squared_error(y_true, y_pred)
+    return {
+        'MSE': mse,
+        'MAE': mean_absolute_error(y_true, y_pred),
+        'R-squared': r2_score(y_true, y_pred),
+        'RMSE': np.sqrt(mse)
+    }
+
+# 평가와 같은 학습/테스트 분할
+def split(X, y):
+    return train_test_split(X, y, test_size=TEST_SIZE, random_state=SPLIT_RANDOM_STATE)
+
+# Box-Cox 변환한 종속변수로 분위수별 LightGBM 학습 -> {분위수: 모델}
+# Box-Cox 역변환은 단조 증가이므로 변환된 값의 분위수를 역변환하면 매출의 분위수가 됨
+def train_quantiles(X_train, y_train_boxcox, feature_names, quantiles=QUANTILES, params=QUANTILE_PARAMS):
+    return {
+        quantile: LGBMRegressor(objective='quantile', alpha=quantile, random_state=MODEL_RANDOM_STATE,
+                                n_jobs=1, verbose=-1, **params).fit(X_train, y_train_boxcox, feature_name=list(feature_names))
+        for quantile in quantiles
+    }
+
+# 분위수 모델 평가: 테스트 데이터가 가장 낮은/높은 분위수 사이에 들어가는 비율
+def evaluate_quantiles(y_true, quantile_models, X, lambda_):
+    quantiles = sorted(quantile_models)
+    sales = np.sort(np.column_stack([inv_boxcox(quantile_models[q].predict(X), lambda_) for q in quantiles]), axis=1)
+    label = f"{quantile_label(quantiles[0])}~{quantile_label(quantiles[-1])} 포함 비율"
+    return {label: float(np.mean((y_true >= sales[:, 0]) & (y_true <= sales[:, -1])))}
+
+# Box-Cox 변환 + GridSearchCV로 LightGBM 학습
+# - 후보 x fold 학습을 n_jobs개 프로세스에 나눠 실행 (LightGBM 자체는 1스레드로 두어 코어를 나눠 쓰지 않음)
+# - 큰 입력 행렬은 joblib이 메모리 맵으로 공유하고, 동시에 대기시키는 작업 수도 n_jobs개로 제한
+# - 앱에서 입력 컬럼을 확인할 수 있도록 피처 이름(feature_names)을 붙여서 학습
+# - 입력 행렬은 CSR 그대로 사용 (원-핫 컬럼을 dense로 펼치지 않음)
+# - 같은 학습 데이터로 예측 구간용 분위수 모델도 함께 학습
+def train(X, y, feature_names, param_grid=PARAM_GRID, n_jobs=-1, cv=CV):
+    X_train, X_test, y_train, y_test = split(X, y)
+
+    # +1을 더하는 이유는 음수 값이 없도록 하기 위함
+    y_train_boxcox, lambda_ = boxcox(y_train + 1)
+
+    grid_search = GridSearchCV(estimator=LGBMRegressor(random_state=MODEL_RANDOM_STATE, n_jobs=1, verbose=-1),
+                               param_grid=param_grid, cv=cv, n_jobs=n_jobs, pre_dispatch='n_jobs')
+    grid_search.fit(X_train, y_train_boxcox, feature_name=list(feature_names))
+
+    model = grid_search.best_estimator_
+    quantile_models = train_quantiles(X_train, y_train_boxcox, feature_names)
+    metrics = evaluate(y_test, inv_boxcox(model.predict(X_test), lambda_))
+    metrics.update(evaluate_quantiles(y_test, quantile_models, X_test, lambda_))
+    return model, lambda_, quantile_models, grid_search.best_params_, metrics
+
+# 저장된 본 모델은 그대로 두고 분위수 모델만 학습 (본 모델의 lambda로 Box-Cox 변환)
+def train_quantiles_only(X, y, feature_names, lambda_):
+    X_train, X_test, y_train, y_test = split(X, y)
+    quantile_models = train_quantiles(X_train, boxcox(y_train + 1, lmbda=lambda_), feature_names)
+    return quantile_models, evaluate_quantiles(y_test, quantile_models, X_test, lambda_)
+
+# 모델 (model, lambda_, 분위수 모델 dict) 튜플과 전처리 파일 저장
+# 두 파일을 모두 임시 파일에 쓴 뒤 연달아 교체해서 앱이 서로 다른 버전의 모델/전처리를 읽는 구간을 줄임
+def save_artifacts(model, lambda_, preprocessor, path=MODEL_PATH, quantile_models=None):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    model_tmp, state_tmp = path + '.tmp', preprocessor_path(path) + '.tmp'
+    joblib.dump((model, lambda_, quantile_models or {}), model_tmp)
+    joblib.dump(preprocessor.to_dict(), state_tmp)
+    os.replace(state_tmp, preprocessor_path(path))
+    os.replace(model_tmp, path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="매출 예측 모델 학습 (ML_final.ipynb와 같은 과정)")
+    parser.add_argument('--output', default=MODEL_PATH, help="모델 파일 경로 (전처리 파일은 같은 폴더에 저장)")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="동시에 학습할 프로세스 수 (기본: 전체 코어)")
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help="학습 행렬 캐시 폴더 (빈 문자열이면 캐시하지 않음)")
+    parser.add_argument('--dry-run', action='store_true', help="학습과 평가만 하고 저장하지 않음")
+    parser.add_argument('--quantiles-only', action='store_true',
+                        help="--output의 본 모델과 전처리는 그대로 두고 분위수 모델만 학습해서 같은 파일에 저장")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.quantiles_only:
+        model, lambda_ = joblib.load(args.output)[:2]
+        preprocessor = Preprocessor.load(preprocessor_path(args.output))
+        X, y = encode_with(preprocessor)
+    else:
+        preprocessor, X, y = load_training_data(args.cache_dir)
+    print(f"학습 데이터 {X.shape[0]:,}행 x {X.shape[1]}컬럼 ({time.perf_counter() - start:.2f}초)")
+
+    start = time.perf_counter()
+    if args.quantiles_only:
+        quantile_models, metrics = train_quantiles_only(X, y, preprocessor.feature_names, lambda_)
+        print(f"분위수 모델 {sorted(quantile_models)} ({time.perf_counter() - start:.2f}초)")
+    else:
+        model, lambda_, quantile_models, best_params, metrics = train(X, y, preprocessor.feature_names, n_jobs=args.n_jobs)
+        print(f"최적 파라미터: {best_params}, lambda: {lambda_:.6f} ({time.perf_counter() - start:.2f}초)")
+    print(', '.join(f"{name}: {value:,.4f}" for name, value in metrics.items()))
+
+    if not args.dry_run:
+        save_artifacts(model, lambda_, preprocessor, args.output, quantile_models)
+        print(f"모델 저장 -> {args.output}, {preprocessor_path(args.output)}")
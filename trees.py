@@ -0,0 +1,240 @@
+# -*- coding:utf-8 -*-
+import os
+import argparse
+import time
+import logging
+import joblib
+import numpy as np
+from data_loader import file_hash
+
+# LightGBM 결측 처리 방식 (decision_type의 missing_type)
+MISSING_TYPES = {'None': 0, 'Zero': 1, 'NaN': 2}
+
+# LightGBM이 0으로 보는 범위 (kZeroThreshold)
+ZERO_THRESHOLD = 1e-35
+
+# 원래 모델과 비교할 때 허용하는 오차 (Box-Cox 스케일의 원시 점수)
+TOLERANCE = 1e-9
+
+# 한 번에 순회하는 (행 x 트리) 수 (메모리 사용량 제한)
+CHUNK_SIZE = 1 << 20
+
+logger = logging.getLogger(__name__)
+
+
+# 모델 파일 옆에 저장되는 트리 노드 표 경로
+def trees_path(model_path):
+    return os.path.splitext(model_path)[0] + '_trees.npz'
+
+
+# LightGBM 부스터를 펼친 노드 표
+# - 모든 트리의 내부 노드/리프를 각각 하나의 배열에 이어 붙임
+# - 자식 번호가 0 이상이면 내부 노드, 음수면 ~자식 번호가 리프 번호
+# - 예측은 (행, 트리) 쌍 전체를 깊이 단위로 한 단계씩 내려가며 계산 (트리 수만큼 반복하지 않음)
+class FlatForest:
+    FIELDS = ['roots', 'feature', 'threshold', 'left', 'right', 'default_left', 'missing_type', 'leaf_value']
+
+    def __init__(self, roots, feature, threshold, left, right, default_left, missing_type, leaf_value, n_features):
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.missing_type = np.asarray(missing_type, dtype=np.int8)
+        self.leaf_value = np.asarray(leaf_value, dtype=np.float64)
+        self.n_features = int(n_features)
+        self._plain = not self.missing_type.any()
+        self._children = np.column_stack([self.right, self.left]).ravel()
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    # booster.dump_model()의 트리 구조 -> 노드 표 (수치형 분기만 지원)
+    @classmethod
+    def from_booster(cls, booster):
+        dump = booster.dump_model()
+        if dump['num_tree_per_iteration'] != 1:
+            raise ValueError("다중 클래스 모델은 지원하지 않습니다.")
+
+        nodes = {name: [] for name in ['feature', 'threshold', 'left', 'right', 'default_left', 'missing_type']}
+        leaf_value = []
+
+        def add(node):
+            if 'split_index' not in node:
+                leaf_value.append(node['leaf_value'])
+                return ~(len(leaf_value) - 1)
+            if node['decision_type'] != '<=':
+                raise ValueError(f"지원하지 않는 분기 방식입니다: {node['decision_type']}")
+            index = len(nodes['feature'])
+            nodes['feature'].append(node['split_feature'])
+            nodes['threshold'].append(node['threshold'])
+            nodes['default_left'].append(node['default_left'])
+            nodes['missing_type'].append(MISSING_TYPES[node['missing_type']])
+            nodes['left'].append(0)
+            nodes['right'].append(0)
+            nodes['left'][index] = add(node['left_child'])
+            nodes['right'][index] = add(node['right_child'])
+            return index
+
+        roots = [add(tree['tree_structure']) for tree in dump['tree_info']]
+        return cls(roots, leaf_value=leaf_value, n_features=dump['max_feature_idx'] + 1, **nodes)
+
+    # (행, 트리) 쌍별 리프 번호
+    # values(rows, features): 행/피처 번호 배열 -> 입력 값 배열
+    # - 아직 리프에 닿지 않은 쌍만 남겨 가며 한 단계씩 내려감 (자식 번호는 [오른쪽, 왼쪽] 순으로 한 배열에서 조회)
+    # - 결측 처리가 필요 없는 모델(missing_type이 모두 None)은 비교만 함 (NaN 입력은 호출하는 쪽에서 0으로 바꿈)
+    def leaves(self, values, n_rows):
+        node = np.tile(self.roots, n_rows)
+        active = np.flatnonzero(node >= 0)
+        rows = active // self.n_trees
+        index = node[active]
+        while len(active):
+            x = values(rows, self.feature[index])
+            if self._plain:
+                go_left = x <= self.threshold[index]
+            else:
+                go_left = self._decide(x, index)
+            index = self._children[2 * index + go_left]
+
+            done = index < 0
+            if done.any():
+                node[active[done]] = index[done]
+                keep = ~done
+                active, rows, index = active[keep], rows[keep], index[keep]
+        return (~node).reshape(n_rows, self.n_trees)
+
+    # LightGBM NumericalDecision과 같은 결측 처리
+    def _decide(self, x, index):
+        missing_type = self.missing_type[index]
+        nan = np.isnan(x)
+        x = np.where(nan & (missing_type != MISSING_TYPES['NaN']), 0.0, x)
+        missing = ((missing_type == MISSING_TYPES['Zero']) & (np.abs(x) <= ZERO_THRESHOLD)) \
+                  | ((missing_type == MISSING_TYPES['NaN']) & nan)
+        return np.where(missing, self.default_left[index], x <= self.threshold[index])
+
+    # 결측 처리가 필요 없는 모델이면 NaN 입력을 LightGBM과 같이 0으로 바꿈
+    def _fill_nan(self, values):
+        if self._plain and np.isnan(values).any():
+            return np.where(np.isnan(values), 0.0, values)
+        return values
+
+    # 행별 리프 값의 합 (행 수가 많으면 나눠서 계산)
+    def _predict(self, values, n_rows):
+        rows_per_chunk = max(1, CHUNK_SIZE // max(self.n_trees, 1))
+        result = np.empty(n_rows, dtype=np.float64)
+        for start in range(0, n_rows, rows_per_chunk):
+            stop = min(start + rows_per_chunk, n_rows)
+            leaves = self.leaves(lambda rows, features: values(rows + start, features), stop - start)
+            result[start:stop] = self.leaf_value[leaves].sum(axis=1)
+        return result
+
+    # 모델 입력 행렬 (n_rows x n_features) -> 원시 점수 (model.predict와 같은 값)
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"입력 행렬의 컬럼 수가 모델({self.n_features}개)과 다릅니다: {X.shape}")
+        flat = self._fill_nan(np.ascontiguousarray(X)).ravel()
+        return self._predict(lambda rows, features: flat[rows * self.n_features + features], len(X))
+
+    # 숫자형 행렬 + 범주형 그룹별 원-핫 위치 -> 원시 점수
+    # 원-핫 컬럼은 행마다 그룹 수만큼만 1이므로 전체 행렬을 만들지 않고 해당 그룹의 위치와 비교해서 값을 구함
+    # - numeric: 정규화까지 끝난 숫자형 변수 (n_rows x 숫자형 변수 수, 모델 컬럼 앞부분)
+    # - positions: 그룹별 원-핫 컬럼 번호 (n_rows x 그룹 수, 학습 때 없던 값은 -1)
+    # - group_starts: 그룹별 첫 원-핫 컬럼 번호
+    def predict_encoded(self, numeric, positions, group_starts):
+        numeric = self._fill_nan(np.ascontiguousarray(numeric, dtype=np.float64))
+        positions = np.ascontiguousarray(positions, dtype=np.int64)
+        n_numeric, n_groups = numeric.shape[1], positions.shape[1]
+
+        # 피처 번호 -> 숫자형 행렬의 열 / 원-핫 그룹 번호
+        feature_ids = np.arange(self.n_features)
+        numeric_column = np.minimum(feature_ids, n_numeric - 1)
+        group = np.maximum(np.searchsorted(group_starts, feature_ids, side='right') - 1, 0)
+        numeric_flat, positions_flat = numeric.ravel(), positions.ravel()
+
+        def values(rows, features):
+            hot = positions_flat[rows * n_groups + group[features]] == features
+            return np.where(features < n_numeric, numeric_flat[rows * n_numeric + numeric_column[features]], hot)
+
+        return self._predict(values, len(numeric))
+
+    # 원래 모델과의 최대 오차 (원시 점수)
+    def max_error(self, model, X):
+        return float(np.max(np.abs(self.predict(X) - model.predict(X)), initial=0.0))
+
+    def to_dict(self):
+        return {**{name: getattr(self, name) for name in self.FIELDS}, 'n_features': np.int64(self.n_features)}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(**{name: state[name] for name in cls.FIELDS}, n_features=int(state['n_features']))
+
+    # 모델 파일 해시를 함께 저장해서 다른 모델의 노드 표를 읽지 않도록 함
+    def save(self, path, model_sha1):
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(tmp_path, model_sha1=np.array(model_sha1), **self.to_dict())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, model_sha1=None):
+        with np.load(path) as state:
+            if model_sha1 is not None and str(state['model_sha1']) != model_sha1:
+                raise ValueError(f"{path}는 다른 모델 파일로 만든 노드 표입니다.")
+            return cls.from_dict(state)
+
+
+# 모델 파일의 부스터를 노드 표로 저장 (원래 모델과 오차가 허용 범위를 넘으면 저장하지 않음)
+def export_trees(model_path, X, path=None):
+    model = joblib.load(model_path)[0]
+    forest = FlatForest.from_booster(model.booster_)
+    error = forest.max_error(model, X)
+    if error > TOLERANCE:
+        raise ValueError(f"노드 표 예측이 원래 모델과 다릅니다 (최대 오차 {error:.3e}).")
+
+    path = path or trees_path(model_path)
+    forest.save(path, file_hash(model_path))
+    return forest, path, error
+
+# 모델 파일의 노드 표 (저장된 노드 표가 없거나 다른 모델의 것이면 부스터에서 바로 만듦)
+def load_forest(model_path, booster):
+    path = trees_path(model_path)
+    if os.path.exists(path):
+        try:
+            return FlatForest.load(path, file_hash(model_path))
+        except ValueError:
+            logger.warning("%s가 현재 모델과 맞지 않아 부스터에서 노드 표를 다시 만듭니다.", path)
+    return FlatForest.from_booster(booster)
+
+
+if __name__ == '__main__':
+    import data_loader
+    import features
+    from model_registry import MODEL_PATH, registry
+
+    parser = argparse.ArgumentParser(description="LightGBM 모델을 NumPy 노드 표로 내보내기 (전체 학습 데이터로 원래 모델과 비교)")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--output', help="노드 표 경로 (기본: 모델 파일 옆 *_trees.npz)")
+    args = parser.parse_args()
+
+    model_entry = registry.get()
+    data = features.add_density(data_loader.get_quarter_data().copy())
+    X = model_entry.preprocessor.transform(data)
+
+    forest, path, error = export_trees(args.model, X, args.output)
+    print(f"트리 {forest.n_trees}개, 내부 노드 {len(forest.feature):,}개, 리프 {len(forest.leaf_value):,}개 -> {path} "
+          f"({os.path.getsize(path):,} bytes)")
+
+    numeric, positions = model_entry.preprocessor.encode(data)
+    group_starts = model_entry.preprocessor.encoder.group_starts
+    encoded_error = np.max(np.abs(forest.predict_encoded(numeric, positions, group_starts) - model_entry.booster.predict(X)))
+    print(f"{len(X):,}행 검증: 최대 오차 {error:.3e} (원-핫 위치 입력 {encoded_error:.3e})")
+
+    for name, fn in [('LGBMRegressor.predict', lambda: model_entry.model.predict(X)),
+                     ('Booster.predict', lambda: model_entry.booster.predict(X)),
+                     ('FlatForest.predict', lambda: forest.predict(X)),
+                     ('FlatForest.predict_encoded', lambda: forest.predict_encoded(numeric, positions, group_starts))]:
+        start = time.perf_counter()
+        fn()
+        print(f"{name}: {(time.perf_counter() - start) * 1000:,.1f}ms")